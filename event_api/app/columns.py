@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import re
+from array import array
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+_SET_BIT = re.compile("1")
+
+
+def bitmap_from_positions(positions: Iterable[int], size: int) -> int:
+	"""Bitmap (a Python int) with the given bit positions set."""
+	buf = bytearray((size + 7) // 8)
+	for pos in positions:
+		buf[pos >> 3] |= 1 << (pos & 7)
+	return int.from_bytes(buf, "little")
+
+
+def iter_positions(bitmap: int, reverse: bool = False) -> Iterator[int]:
+	"""Set bit positions of bitmap, lowest first (highest first if reverse).
+
+	bin() and the regex scan run in C, so this costs O(size) C work plus one
+	Python step per set bit, rather than a big-int operation per bit.
+	"""
+	if bitmap <= 0:
+		return iter(())
+	digits = bin(bitmap)[2:]
+	if reverse:
+		top = len(digits) - 1
+		return (top - match.start() for match in _SET_BIT.finditer(digits))
+	return (match.start() for match in _SET_BIT.finditer(digits[::-1]))
+
+
+def bitmap_count(bitmap: int) -> int:
+	return bin(bitmap).count("1")
+
+
+class CodedColumn:
+	"""String column stored as integer codes, with a bitmap per distinct value."""
+
+	def __init__(self, values: Sequence[str], position: Sequence[int]) -> None:
+		self.values: List[str] = []  # code -> value
+		self.codes = array("i")  # event index -> code, -1 when empty
+		self.bitmaps: Dict[str, int] = {}
+		self.code_of: Dict[str, int] = {}
+		code_of = self.code_of
+		positions: List[List[int]] = []
+		for idx, value in enumerate(values):
+			if not value:
+				self.codes.append(-1)
+				continue
+			code = code_of.get(value)
+			if code is None:
+				code = code_of[value] = len(self.values)
+				self.values.append(value)
+				positions.append([])
+			self.codes.append(code)
+			positions[code].append(position[idx])
+		for code, value in enumerate(self.values):
+			self.bitmaps[value] = bitmap_from_positions(positions[code], len(values))
+
+	def bitmap_any(self, values: Iterable[str]) -> int:
+		"""Events having any of values."""
+		bitmap = 0
+		for value in values:
+			bitmap |= self.bitmaps.get(value, 0)
+		return bitmap
+
+
+def _text(value: Any) -> str:
+	return str(value or "").strip()
+
+
+class EventColumns:
+	"""Columnar sidecar of a snapshot's events, used for filtering.
+
+	Scalars live in typed arrays indexed by event index. Bitmaps are Python
+	ints whose bit p stands for the event at position p of the start_desc
+	order (order[p]), so filters combine with & and |, and reading the set
+	bits back yields the matches already sorted newest first.
+	"""
+
+	def __init__(self, events: Sequence[Dict[str, Any]]) -> None:
+		size = len(events)
+		self.size = size
+		self.starts = array("q", [int(ev.get("start_timestamp") or 0) for ev in events])
+		self.ends = array("q", [int(ev.get("end_timestamp") or 0) for ev in events])
+		# Newest first; equal starts keep file order.
+		self.order = array("q", sorted(range(size), key=self.starts.__getitem__, reverse=True))
+		self.position = array("q", bytes(8 * size))
+		for pos, idx in enumerate(self.order):
+			self.position[idx] = pos
+		self.all = (1 << size) - 1
+		self.category = CodedColumn([_text(ev.get("category")) for ev in events], self.position)
+		self.ticket_type = CodedColumn([_text(ev.get("ticket_type")) for ev in events], self.position)
+
+	def bitmap_of(self, indices: Iterable[int]) -> int:
+		"""Bitmap of the given event indices."""
+		position = self.position
+		return bitmap_from_positions((position[idx] for idx in indices), self.size)
+
+	def indices(self, bitmap: int, sort: str = "start_desc", limit: Optional[int] = None) -> List[int]:
+		"""Event indices in bitmap ordered by sort ("start_desc" or "start_asc").
+
+		With a limit only the first limit results are produced. start_asc is
+		the reverse of start_desc except that events with equal starts stay in
+		file order, so runs of equal starts are flipped back.
+		"""
+		order = self.order
+		if sort == "start_desc":
+			return [order[pos] for pos in islice(iter_positions(bitmap), limit)]
+		starts = self.starts
+		result: List[int] = []
+		run: List[int] = []
+		run_start = None
+		for pos in iter_positions(bitmap, reverse=True):
+			idx = order[pos]
+			start = starts[idx]
+			if run and start != run_start:
+				result.extend(reversed(run))
+				run = []
+				if limit is not None and len(result) >= limit:
+					return result[:limit]
+			run.append(idx)
+			run_start = start
+		result.extend(reversed(run))
+		return result if limit is None else result[:limit]
@@ -19,15 +19,39 @@ def getenv_int(name: str, default: int) -> int:
 
 EVENTS_JSON_PATH: str = getenv_str("EVENTS_JSON_PATH", os.path.join(os.getcwd(), "output", "events.json"))  # type: ignore[assignment]
 USERDATA_JSON_PATH: str = getenv_str("USERDATA_JSON_PATH", os.path.join(os.getcwd(), "output", "userdata.json"))  # type: ignore[assignment]
+USERDATA_SQLITE_PATH: str = getenv_str("USERDATA_SQLITE_PATH", os.path.join(os.getcwd(), "output", "userdata.sqlite3"))  # type: ignore[assignment]
+EVENTS_CACHE_DIR: str = getenv_str("EVENTS_CACHE_DIR", os.path.join(os.getcwd(), "output", "cache"))  # type: ignore[assignment]  # "" = off
 IMAGES_DIR_PATH: str = getenv_str("IMAGES_DIR_PATH", os.path.join(os.getcwd(), "output", "images"))  # type: ignore[assignment]
+IMAGE_CACHE_DIR: str = getenv_str("IMAGE_CACHE_DIR", os.path.join(os.getcwd(), "output", "cache", "images"))  # type: ignore[assignment]
 API_BASE_URL: str = getenv_str("API_BASE_URL", "http://localhost:8000")  # type: ignore[assignment]
 
 MAX_LIMIT: int = getenv_int("MAX_LIMIT", 500)
 DEFAULT_RANDOM_AMOUNT: int = getenv_int("DEFAULT_RANDOM_AMOUNT", 5)
 DEFAULT_RECENT_AMOUNT: int = getenv_int("DEFAULT_RECENT_AMOUNT", 5)
+DEFAULT_HOT_AMOUNT: int = getenv_int("DEFAULT_HOT_AMOUNT", 6)
+HOT_HALF_LIFE_HOURS: int = getenv_int("HOT_HALF_LIFE_HOURS", 0)  # /hot popularity decay, 0 = all-time counts
 DEFAULT_FILTER_LIMIT: int = getenv_int("DEFAULT_FILTER_LIMIT", 0)  # 0 = unlimited
+SEARCH_CACHE_SIZE: int = getenv_int("SEARCH_CACHE_SIZE", 256)  # cached /search filter combinations, 0 = off
+
+USERDATA_BACKEND: str = getenv_str("USERDATA_BACKEND", "json")  # type: ignore[assignment]  # json | sqlite
+USERDATA_COMPACT_EVERY: int = getenv_int("USERDATA_COMPACT_EVERY", 1000)  # journal records per snapshot, 0 = only on start/shutdown
+
+IMAGE_MEMORY_CACHE_BYTES: int = getenv_int("IMAGE_MEMORY_CACHE_BYTES", 32 * 1024 * 1024)
+IMAGES_RESCAN_INTERVAL: int = getenv_int("IMAGES_RESCAN_INTERVAL", 5)  # seconds between images dir mtime checks
+IMAGE_CACHE_MAX_BYTES: int = getenv_int("IMAGE_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+IMAGE_DEFAULT_QUALITY: int = getenv_int("IMAGE_DEFAULT_QUALITY", 80)
+IMAGE_RESIZE_WORKERS: int = getenv_int("IMAGE_RESIZE_WORKERS", 2)
+THUMBNAIL_WIDTH: int = getenv_int("THUMBNAIL_WIDTH", 320)  # 0 = no thumbnail_url in event JSON
+
+RESPONSE_CACHE_BYTES: int = getenv_int("RESPONSE_CACHE_BYTES", 64 * 1024 * 1024)  # rendered/compressed event responses
+COMPRESS_MIN_BYTES: int = getenv_int("COMPRESS_MIN_BYTES", 1024)  # smaller responses are sent uncompressed
+JSON_CACHE_CONTROL: str = getenv_str("JSON_CACHE_CONTROL", "no-cache")  # type: ignore[assignment]  # events endpoints; clients revalidate via ETag
+
+EVENTS_RELOAD_INTERVAL: int = getenv_int("EVENTS_RELOAD_INTERVAL", 2)  # seconds, 0 = check on every request
 
 ENABLE_CORS: bool = getenv_str("ENABLE_CORS", "true") == "true"
+ENABLE_METRICS: bool = getenv_str("ENABLE_METRICS", "true") == "true"
+PROFILE_TOKEN: str = getenv_str("PROFILE_TOKEN", "")  # type: ignore[assignment]  # "" = profiling off
 
 HOT_EVENT_IDS: list[str] = [
 	"d891f670-6735-4473-8f5d-8cc897a6e81d",
@@ -1,55 +1,270 @@
 from __future__ import annotations
 
+import hashlib
 import os
 import random
 import threading
-from typing import Any, Dict, List, Optional, Sequence
+import time
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 import orjson
 
-from .config import API_BASE_URL, EVENTS_JSON_PATH
+from .columns import EventColumns, bitmap_count
+from .config import API_BASE_URL, EVENTS_CACHE_DIR, EVENTS_JSON_PATH, SEARCH_CACHE_SIZE, THUMBNAIL_WIDTH
+from .facets import SessionCalendar
+from .geo_index import MAX_DISTANCE_M, GeoIndex
+from .metrics import EVENTS_INDEX_SECONDS, EVENTS_PARSE_SECONDS, EVENTS_RELOADS
+from .projection import DERIVED_FIELDS, VIEWS, Projection, project
+from .query_cache import QueryResultCache
+from .session_index import SessionIntervalIndex
+from .snapshot_cache import SharedSnapshotCache
+from .text_index import TextIndex, normalize as normalize_text
 
+# Distinct (base URL, projection) pairs whose rendered fragments are cached per
+# snapshot (one base URL per Host the API is reached through, times the full
+# event and the VIEWS); further combinations are rendered uncached.
+MAX_RENDER_VARIANTS = 32
+# The same for ad-hoc fields= projections, budgeted separately so arbitrary
+# field lists cannot crowd out the full event and the views.
+MAX_FIELDS_RENDER_VARIANTS = 8
+# Keys rendered events have besides their own (see with_local_image_url).
+RENDERED_FIELDS = ("image_url", "thumbnail_url")
 
-class EventsDataStore:
-	"""Thread-safe in-memory event store with auto-reload on file changes."""
-	
-	def __init__(self, json_path: Optional[str] = None) -> None:
-		self._json_path: str = json_path or EVENTS_JSON_PATH
-		self._lock = threading.Lock()
-		self._last_mtime: float = 0.0
-		self._events: List[Dict[str, Any]] = []
-		self._sorted_indices_start_desc: List[int] = []
-		self._category_to_indices: Dict[str, List[int]] = {}
-		self._ticket_type_to_indices: Dict[str, List[int]] = {}
-		self._venue_key_to_indices: Dict[str, List[int]] = {}
+# An uncached filtered search only needing the first k of m matches reads just
+# those k from the bitmap, without caching, when k * PARTIAL_SELECT_RATIO <= m.
+PARTIAL_SELECT_RATIO = 4
 
-	def _file_mtime(self) -> float:
-		try:
-			return os.path.getmtime(self._json_path)
-		except OSError:
-			return 0.0
+SORT_ORDERS = ("start_desc", "start_asc")
 
-	def _rebuild_indices(self) -> None:
-		self._sorted_indices_start_desc = sorted(
-			range(len(self._events)),
-			key=lambda i: int(self._events[i].get("start_timestamp") or 0),
-			reverse=True,
-		)
-		self._category_to_indices.clear()
-		self._ticket_type_to_indices.clear()
-		self._venue_key_to_indices.clear()
+# First radius a k-nearest search tries before widening.
+NEAREST_START_RADIUS_M = 1000.0
+
+# Streamed responses are sent in chunks of roughly this many bytes.
+STREAM_CHUNK_BYTES = 32 * 1024
+
+
+_VIEW_PROJECTIONS = frozenset(VIEWS.values())
+
+
+def _is_ad_hoc(projection: Projection) -> bool:
+	"""Whether projection came from fields= rather than being the full event or a view."""
+	return projection is not None and projection not in _VIEW_PROJECTIONS
+
+
+def image_filename(event: Dict[str, Any]) -> Optional[str]:
+	"""Name of the event's cached image inside IMAGES_DIR_PATH, if it has one."""
+	local_path = event.get("local_image_path", "")
+	if not local_path:
+		return None
+	return local_path.replace("\\", "/").split("/")[-1]
+
+
+def with_local_image_url(event: Dict[str, Any], base_url: str) -> Dict[str, Any]:
+	"""Return a copy of event whose image_url (and thumbnail_url) point at this API's /images."""
+	event_copy = event.copy()
+	filename = image_filename(event)
+	if filename:
+		event_copy["image_url"] = f"{base_url}/images/{filename}"
+		if THUMBNAIL_WIDTH:
+			event_copy["thumbnail_url"] = f"{base_url}/images/{filename}?w={THUMBNAIL_WIDTH}"
+	return event_copy
+
+
+def _first_ranked_after(indices: Sequence[int], rank: Sequence[int], after_rank: int) -> int:
+	"""Position of the first of indices (ordered by rank) whose rank exceeds after_rank."""
+	lo, hi = 0, len(indices)
+	while lo < hi:
+		mid = (lo + hi) // 2
+		if rank[indices[mid]] <= after_rank:
+			lo = mid + 1
+		else:
+			hi = mid
+	return lo
+
+
+class EventsSnapshot:
+	"""Immutable view of one events.json generation and its derived indices.
+
+	A snapshot is fully built before it is published, and never mutated
+	afterwards, so readers holding a reference always see events and indices
+	that belong together. The only state filled in later is memoized output
+	derived from the events, such as the per-base-URL JSON fragments.
+
+	Built with the previous snapshot, events are matched to it by event_id, and
+	the text index postings and rendered fragments of unchanged events are
+	carried over instead of being recomputed.
+	"""
+
+	def __init__(
+		self,
+		events: List[Dict[str, Any]],
+		generation: int = 0,
+		mtime: float = 0.0,
+		source_hash: str = "",
+		previous: Optional[EventsSnapshot] = None,
+	) -> None:
+		self.events: List[Dict[str, Any]] = events
+		self.generation: int = generation
+		self.mtime: float = mtime
+		# Content hash of the events.json this was built from; unlike generation,
+		# it is the same in every worker process.
+		self.source_hash: str = source_hash
+		self.event_id_to_index: Dict[str, int] = {}
+		self.columns: EventColumns = EventColumns([])
+		self.event_starts: Sequence[int] = self.columns.starts
+		self.sorted_indices_start_desc: Sequence[int] = self.columns.order
+		# Event indices in each SORT_ORDERS order (ties by position in the file),
+		# and the inverse: ranks[sort][idx] is idx's position in orders[sort].
+		self.orders: Dict[str, Sequence[int]] = {}
+		self.ranks: Dict[str, Sequence[int]] = {}
+		# Sessions of all events flattened in event order; the sessions of event i
+		# are session ids session_offsets[i] .. session_offsets[i + 1] - 1.
+		self.session_offsets = array("q", [0])
+		self.session_owner = array("q")
+		self.session_starts = array("q")
+		self.session_ends = array("q")
+		self.session_index: SessionIntervalIndex = SessionIntervalIndex([], [])
+		# Sessions with coordinates, by session id.
+		self.geo_index: GeoIndex = GeoIndex([])
+		self.calendar: SessionCalendar = SessionCalendar(self.columns, [], [], [])
+		self.venue_key_to_indices: Dict[str, List[int]] = {}
+		# Normalized (stripped, lowercased) session platform -> columns bitmap of
+		# the events with a session there, and an interval index over just that
+		# platform's sessions (whose global ids are platform_session_ids).
+		self.platform_bitmaps: Dict[str, int] = {}
+		self.platform_session_ids: Dict[str, Sequence[int]] = {}
+		self.platform_session_index: Dict[str, SessionIntervalIndex] = {}
+		self.text_index: TextIndex = TextIndex([])
+		self.venues: List[Dict[str, Any]] = []
+		self.venues_json: bytes = b"[]"
+		self._fragments: Dict[Tuple[str, Projection], List[Optional[bytes]]] = {}
+		# Every key a rendered event can have; fields= names outside it are dropped.
+		self.field_names: frozenset = frozenset()
+		# Events carried over unchanged from the previous snapshot.
+		self.reused_events: int = 0
+		self._rebuild_indices(previous if previous is not None and previous.events else None)
+		names = set(RENDERED_FIELDS)
+		names.update(DERIVED_FIELDS)
+		for ev in self.events:
+			names.update(ev)
+		self.field_names = frozenset(names)
+
+	def __getstate__(self) -> Dict[str, Any]:
+		# Fragments are memoized per process; the shared snapshot file stays lean.
+		state = dict(self.__dict__)
+		state["_fragments"] = {}
+		state["reused_events"] = 0
+		return state
+
+	def _diff(self, previous: EventsSnapshot) -> array:
+		"""Index in previous of each event that is unchanged there (matched by event_id), else -1."""
+		old_index = array("q", [-1]) * len(self.events)
+		claimed = set()
+		for idx, ev in enumerate(self.events):
+			old = previous.event_id_to_index.get(str(ev.get("event_id") or ""))
+			if old is not None and old not in claimed and previous.events[old] == ev:
+				old_index[idx] = old
+				claimed.add(old)
+		self.reused_events = len(claimed)
+		return old_index
+
+	def _rebuild_indices(self, previous: Optional[EventsSnapshot] = None) -> None:
+		self.columns = columns = EventColumns(self.events)
+		self.event_starts = columns.starts
+		self.sorted_indices_start_desc = columns.order
+		self.orders = {
+			"start_desc": columns.order,
+			"start_asc": array("q", columns.indices(columns.all, "start_asc")),
+		}
+		for sort, order in self.orders.items():
+			rank = array("q", bytes(8 * len(order)))
+			for pos, idx in enumerate(order):
+				rank[idx] = pos
+			self.ranks[sort] = rank
 		
-		for idx, ev in enumerate(self._events):
-			category = str(ev.get("category") or "").strip()
-			if category:
-				self._category_to_indices.setdefault(category, []).append(idx)
-			ticket_type = str(ev.get("ticket_type") or "").strip()
-			if ticket_type:
-				self._ticket_type_to_indices.setdefault(ticket_type, []).append(idx)
+		session_starts = self.session_starts
+		session_ends = self.session_ends
+		session_points: List[Tuple[int, float, float]] = []
+		platform_sessions: Dict[str, List[int]] = {}
+		platform_events: Dict[str, List[int]] = {}
+		venues_dict: Dict[str, Dict[str, Any]] = {}
+		for idx, ev in enumerate(self.events):
+			sessions = ev.get("sessions")
+			if sessions and isinstance(sessions, list):
+				for session in sessions:
+					session_id = len(self.session_owner)
+					session_starts.append(int(session.get("start_timestamp") or 0))
+					session_ends.append(int(session.get("end_timestamp") or 0))
+					self.session_owner.append(idx)
+					point = self._coordinates(session)
+					if point is not None:
+						session_points.append((session_id, *point))
+					platform = str(session.get("platform") or "").strip()
+					if not platform:
+						continue
+					platform_key = platform.lower()
+					platform_sessions.setdefault(platform_key, []).append(session_id)
+					platform_events.setdefault(platform_key, []).append(idx)
+					if platform not in venues_dict:
+						venue = self._venue_from_session(platform, session)
+						if venue is not None:
+							venues_dict[platform] = venue
+			self.session_offsets.append(len(self.session_owner))
+		self.session_index = SessionIntervalIndex(session_starts, session_ends)
+		self.geo_index = GeoIndex(session_points)
+		self.calendar = SessionCalendar(columns, self.session_owner, session_starts, session_ends)
+		
+		for platform_key, session_ids in platform_sessions.items():
+			self.platform_session_ids[platform_key] = array("q", session_ids)
+			self.platform_session_index[platform_key] = SessionIntervalIndex(
+				[session_starts[sid] for sid in session_ids],
+				[session_ends[sid] for sid in session_ids],
+			)
+			self.platform_bitmaps[platform_key] = columns.bitmap_of(platform_events[platform_key])
+		self.venues = sorted(venues_dict.values(), key=lambda x: x["platform"])
+		self.venues_json = orjson.dumps(self.venues)
+		
+		for idx, ev in enumerate(self.events):
+			event_id = ev.get("event_id")
+			if event_id:
+				self.event_id_to_index.setdefault(str(event_id), idx)
 			venue_key = self._compute_venue_key(ev)
-			self._venue_key_to_indices.setdefault(venue_key, []).append(idx)
+			self.venue_key_to_indices.setdefault(venue_key, []).append(idx)
+		if previous is None:
+			self.text_index = TextIndex(self.events)
+			return
+		old_index = self._diff(previous)
+		self.text_index = TextIndex(self.events, previous.text_index, old_index)
+		# Readers of previous may still be adding variants, so copy the items first.
+		for key, fragments in list(previous._fragments.items()):
+			self._fragments[key] = [fragments[old] if old >= 0 else None for old in old_index]
+
+	@staticmethod
+	def _coordinates(session: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+		lat, lon = session.get("latitude"), session.get("longitude")
+		if lat is None or lon is None:
+			return None
+		try:
+			return float(lat), float(lon)
+		except (ValueError, TypeError):
+			return None
+
+	@classmethod
+	def _venue_from_session(cls, platform: str, session: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+		point = cls._coordinates(session)
+		if point is None:
+			return None
+		lat, lon = point
+		return {
+			"platform": platform,
+			"latitude": lat,
+			"longitude": lon,
+			"google_maps_url": f"https://www.google.com/maps/search/?api=1&query={lat},{lon}"
+		}
 
-	def _compute_venue_key(self, ev: Dict[str, Any]) -> str:
+	@staticmethod
+	def _compute_venue_key(ev: Dict[str, Any]) -> str:
 		"""Compute venue key from first session's platform or coordinates."""
 		sessions = ev.get("sessions")
 		if sessions and isinstance(sessions, list) and len(sessions) > 0:
@@ -65,44 +280,193 @@ class EventsDataStore:
 					pass
 		return ""
 
-	def _load_file(self) -> None:
+	def timeframe_bitmap(self, start_min: Optional[int] = None, end_max: Optional[int] = None) -> int:
+		"""Columns bitmap of events with any session overlapping [start_min, end_max]."""
+		owner = self.session_owner
+		return self.columns.bitmap_of(owner[sid] for sid in self.session_index.query(start_min, end_max))
+
+	def events_at_platform(
+		self, platform_key: str, start_min: Optional[int] = None, end_max: Optional[int] = None
+	) -> List[int]:
+		"""Indices of events with a session at platform_key overlapping the timeframe, newest first."""
+		bitmap = self.platform_bitmaps.get(platform_key)
+		if not bitmap:
+			return []
+		if start_min is not None or end_max is not None:
+			session_ids = self.platform_session_ids[platform_key]
+			owner = self.session_owner
+			local_ids = self.platform_session_index[platform_key].query(start_min, end_max)
+			bitmap = self.columns.bitmap_of(owner[session_ids[local]] for local in local_ids)
+		return self.columns.indices(bitmap)
+
+	def cursor_rank(self, sort: str, start_timestamp: int, event_id: str) -> int:
+		"""Rank in the sort order after which the page following a cursor begins.
+
+		If the cursor's event is gone (the data was reloaded), paging resumes
+		after every event that starts no later (start_asc: no earlier) than it.
+		"""
+		idx = self.event_id_to_index.get(event_id)
+		if idx is not None and self.event_starts[idx] == start_timestamp:
+			return self.ranks[sort][idx]
+		order, starts = self.orders[sort], self.event_starts
+		descending = sort == "start_desc"
+		lo, hi = 0, len(order)
+		while lo < hi:
+			mid = (lo + hi) // 2
+			start = starts[order[mid]]
+			if (start >= start_timestamp) if descending else (start <= start_timestamp):
+				lo = mid + 1
+			else:
+				hi = mid
+		return lo - 1
+
+	def index_of(self, event: Dict[str, Any]) -> Optional[int]:
+		"""Position of event in this snapshot, or None if it is not one of ours."""
+		idx = self.event_id_to_index.get(event.get("event_id"))  # type: ignore[arg-type]
+		if idx is None or self.events[idx] is not event:
+			return None
+		return idx
+
+	def render_event(self, idx: int, base_url: str, projection: Projection = None) -> bytes:
+		"""Serialized JSON of one event, rendered once per base URL and projection."""
+		ad_hoc = _is_ad_hoc(projection)
+		if projection is not None and ad_hoc:
+			projection = tuple(name for name in projection if name in self.field_names)
+		key = (base_url, projection)
+		fragments = self._fragments.get(key)
+		if fragments is None:
+			variants = sum(1 for _, cached in self._fragments if _is_ad_hoc(cached) == ad_hoc)
+			if variants >= (MAX_FIELDS_RENDER_VARIANTS if ad_hoc else MAX_RENDER_VARIANTS):
+				return orjson.dumps(project(with_local_image_url(self.events[idx], base_url), projection))
+			fragments = self._fragments.setdefault(key, [None] * len(self.events))
+		fragment = fragments[idx]
+		if fragment is None:
+			fragment = orjson.dumps(project(with_local_image_url(self.events[idx], base_url), projection))
+			fragments[idx] = fragment
+		return fragment
+
+
+class EventsDataStore:
+	"""Thread-safe in-memory event store with auto-reload on file changes.
+
+	Each load builds a new EventsSnapshot off to the side and publishes it with
+	a single reference swap; readers grab the current snapshot once and never
+	lock. File changes are picked up by a background polling thread once
+	start_watcher() is called, otherwise ensure_loaded() checks the file mtime.
+	"""
+	
+	def __init__(self, json_path: Optional[str] = None, cache_dir: Optional[str] = None) -> None:
+		self._json_path: str = json_path or EVENTS_JSON_PATH
+		self._lock = threading.Lock()
+		self._snapshot: EventsSnapshot = EventsSnapshot([])
+		cache_dir = EVENTS_CACHE_DIR if cache_dir is None else cache_dir
+		self._shared_cache: Optional[SharedSnapshotCache] = SharedSnapshotCache(cache_dir) if cache_dir else None
+		self._watcher: Optional[threading.Thread] = None
+		self._watcher_stop = threading.Event()
+		# Ordered /search results per normalized filter set, dropped on reload.
+		self.query_cache = QueryResultCache(SEARCH_CACHE_SIZE)
+
+	@property
+	def generation(self) -> int:
+		"""Generation of the published snapshot (0 until the first load)."""
+		return self._snapshot.generation
+
+	def _file_mtime(self) -> float:
+		try:
+			return os.path.getmtime(self._json_path)
+		except OSError:
+			return 0.0
+
+	def _load_file(self, mtime: float) -> EventsSnapshot:
 		with open(self._json_path, "rb") as f:
-			data = orjson.loads(f.read())
-		if not isinstance(data, list):
-			raise ValueError("events.json must be a JSON array")
-		self._events = data
-		self._rebuild_indices()
-
-	def ensure_loaded(self) -> None:
-		"""Load or reload data if file changed."""
+			raw = f.read()
+		source_hash = hashlib.sha256(raw).hexdigest()
+		source = "shared_cache"
+
+		def build() -> EventsSnapshot:
+			nonlocal source
+			source = "built"
+			start = time.perf_counter()
+			data = orjson.loads(raw)
+			if not isinstance(data, list):
+				raise ValueError("events.json must be a JSON array")
+			EVENTS_PARSE_SECONDS.observe(time.perf_counter() - start)
+			with EVENTS_INDEX_SECONDS.time():
+				return EventsSnapshot(data, source_hash=source_hash, previous=self._snapshot)
+
+		snap = self._shared_cache.load_or_build(source_hash, build) if self._shared_cache else build()
+		EVENTS_RELOADS.inc(source)
+		snap.generation = self._snapshot.generation + 1
+		snap.mtime = mtime
+		return snap
+
+	def reload_if_changed(self) -> EventsSnapshot:
+		"""Load the file if it changed since the published snapshot."""
+		snap = self._snapshot
 		mtime = self._file_mtime()
-		if self._events and mtime <= self._last_mtime:
-			return
+		if snap.generation and mtime <= snap.mtime:
+			return snap
 		with self._lock:
+			snap = self._snapshot
 			mtime_inner = self._file_mtime()
-			if self._events and mtime_inner == self._last_mtime:
-				return
-			self._load_file()
-			self._last_mtime = mtime_inner
+			if snap.generation and mtime_inner == snap.mtime:
+				return snap
+			self._snapshot = self._load_file(mtime_inner)
+			return self._snapshot
+
+	def ensure_loaded(self) -> EventsSnapshot:
+		"""Return the current snapshot, loading it on first use."""
+		snap = self._snapshot
+		if snap.generation and self._watcher is not None:
+			return snap
+		return self.reload_if_changed()
+
+	def _watch(self, interval: float) -> None:
+		failed_mtime: Optional[float] = None
+		while not self._watcher_stop.wait(interval):
+			mtime = self._file_mtime()
+			if mtime == failed_mtime:
+				continue
+			try:
+				self.reload_if_changed()
+				failed_mtime = None
+			except Exception as exc:
+				failed_mtime = mtime
+				print(f"[events] reload failed, keeping generation {self.generation}: {exc}")
+
+	def start_watcher(self, interval: float) -> None:
+		"""Poll the events file for changes in a daemon thread."""
+		if self._watcher is not None or interval <= 0:
+			return
+		self._watcher_stop.clear()
+		self._watcher = threading.Thread(target=self._watch, args=(interval,), name="events-watcher", daemon=True)
+		self._watcher.start()
+
+	def stop_watcher(self) -> None:
+		if self._watcher is None:
+			return
+		self._watcher_stop.set()
+		self._watcher.join()
+		self._watcher = None
 
 	def get_random(self, amount: int, seed: Optional[int] = None, distinct_venue: bool = False) -> List[Dict[str, Any]]:
-		self.ensure_loaded()
-		n = len(self._events)
+		snap = self.ensure_loaded()
+		n = len(snap.events)
 		if n == 0 or amount <= 0:
 			return []
 		
 		if distinct_venue:
 			r = random.Random(seed) if seed is not None else random.SystemRandom()
-			venue_keys = list(self._venue_key_to_indices.keys())
+			venue_keys = list(snap.venue_key_to_indices.keys())
 			r.shuffle(venue_keys)
 			selected_indices: List[int] = []
 			for vk in venue_keys:
-				group = self._venue_key_to_indices.get(vk) or []
+				group = snap.venue_key_to_indices.get(vk) or []
 				if group:
 					selected_indices.append(r.choice(group))
 					if len(selected_indices) >= amount:
 						break
-			return [self._events[i] for i in selected_indices]
+			return [snap.events[i] for i in selected_indices]
 		
 		if seed is not None:
 			r = random.Random(seed)
@@ -111,102 +475,99 @@ class EventsDataStore:
 			selected = indices[:min(amount, n)]
 		else:
 			selected = random.sample(range(n), k=min(amount, n))
-		return [self._events[i] for i in selected]
+		return [snap.events[i] for i in selected]
 
 	def get_recent(self, amount: int) -> List[Dict[str, Any]]:
-		self.ensure_loaded()
+		snap = self.ensure_loaded()
 		if amount <= 0:
 			return []
-		return [self._events[i] for i in self._sorted_indices_start_desc[:amount]]
+		return [snap.events[i] for i in snap.sorted_indices_start_desc[:amount]]
+
+	def has_event(self, event_id: str) -> bool:
+		return event_id in self.ensure_loaded().event_id_to_index
 
 	def get_event_by_id(self, event_id: str) -> Optional[Dict[str, Any]]:
-		self.ensure_loaded()
-		for event in self._events:
-			if event.get("event_id") == event_id:
-				return event
-		return None
+		snap = self.ensure_loaded()
+		idx = snap.event_id_to_index.get(event_id)
+		return snap.events[idx] if idx is not None else None
 
 	def get_events_by_ids(self, event_ids: Sequence[str]) -> List[Dict[str, Any]]:
-		self.ensure_loaded()
-		events_dict = {event.get("event_id"): event for event in self._events}
-		return [events_dict[eid] for eid in event_ids if eid in events_dict]
-
-	def _has_valid_session_in_timeframe(
-		self, event: Dict[str, Any], 
-		start_min: Optional[int] = None, end_max: Optional[int] = None
-	) -> bool:
-		if start_min is None and end_max is None:
-			return True
-		sessions = event.get("sessions")
-		if not sessions or not isinstance(sessions, list):
-			return False
-		for session in sessions:
-			s_start = int(session.get("start_timestamp") or 0)
-			s_end = int(session.get("end_timestamp") or 0)
-			if start_min is not None and s_end < start_min:
-				continue
-			if end_max is not None and s_start > end_max:
-				continue
-			return True
-		return False
+		snap = self.ensure_loaded()
+		index = snap.event_id_to_index
+		return [snap.events[index[eid]] for eid in event_ids if eid in index]
 
 	def get_events_by_platform(
 		self, platform: str,
 		start_timestamp_min: Optional[int] = None,
 		end_timestamp_max: Optional[int] = None
 	) -> List[Dict[str, Any]]:
-		self.ensure_loaded()
+		snap = self.ensure_loaded()
 		platform_lower = platform.lower().strip()
 		if not platform_lower:
 			return []
-		
-		matching_indices = []
-		for idx, event in enumerate(self._events):
-			sessions = event.get("sessions")
-			if not sessions or not isinstance(sessions, list):
-				continue
-			for session in sessions:
-				if str(session.get("platform") or "").strip().lower() != platform_lower:
+		return [snap.events[i] for i in snap.events_at_platform(platform_lower, start_timestamp_min, end_timestamp_max)]
+
+	def get_nearby(
+		self,
+		lat: float,
+		lon: float,
+		radius_m: Optional[float] = None,
+		k: Optional[int] = None,
+		categories: Optional[Sequence[str]] = None,
+		start_timestamp_min: Optional[int] = None,
+		end_timestamp_max: Optional[int] = None,
+	) -> List[Tuple[Dict[str, Any], float]]:
+		"""(event, distance in meters) pairs, nearest first.
+
+		An event's distance is that of its closest session overlapping the
+		timeframe. With radius_m every event within it is returned; with k only
+		the k nearest (within radius_m, if also given).
+		"""
+		snap = self.ensure_loaded()
+		owner, starts, ends = snap.session_owner, snap.session_starts, snap.session_ends
+		codes = snap.columns.category.codes
+		allowed = {snap.columns.category.code_of[c] for c in categories or () if c in snap.columns.category.code_of}
+		if categories and not allowed:
+			return []
+
+		def nearest_per_event(radius: float) -> Dict[int, float]:
+			best: Dict[int, float] = {}
+			for distance, session_id in snap.geo_index.within(lat, lon, radius):
+				if start_timestamp_min is not None and ends[session_id] < start_timestamp_min:
 					continue
-				if start_timestamp_min is not None or end_timestamp_max is not None:
-					s_start = int(session.get("start_timestamp") or 0)
-					s_end = int(session.get("end_timestamp") or 0)
-					if start_timestamp_min is not None and s_end < start_timestamp_min:
-						continue
-					if end_timestamp_max is not None and s_start > end_timestamp_max:
-						continue
-				matching_indices.append(idx)
-				break
-		
-		matching_indices.sort(key=lambda i: int(self._events[i].get("start_timestamp") or 0), reverse=True)
-		return [self._events[i] for i in matching_indices]
+				if end_timestamp_max is not None and starts[session_id] > end_timestamp_max:
+					continue
+				idx = owner[session_id]
+				if allowed and codes[idx] not in allowed:
+					continue
+				if distance < best.get(idx, MAX_DISTANCE_M + 1):
+					best[idx] = distance
+			return best
+
+		limit_radius = radius_m if radius_m is not None else MAX_DISTANCE_M
+		if k is None:
+			best = nearest_per_event(limit_radius)
+		else:
+			# Widen the search until it holds k events; everything closer than the
+			# radius searched is in it, so the k nearest of those are exact.
+			radius = min(NEAREST_START_RADIUS_M, limit_radius)
+			while True:
+				best = nearest_per_event(radius)
+				if len(best) >= k or radius >= limit_radius:
+					break
+				radius = min(radius * 4, limit_radius)
+		ranked = sorted(best.items(), key=lambda item: (item[1], item[0]))
+		if k is not None:
+			ranked = ranked[:k]
+		return [(snap.events[idx], distance) for idx, distance in ranked]
 
 	def get_all_venues(self) -> List[Dict[str, Any]]:
-		self.ensure_loaded()
-		venues_dict: Dict[str, Dict[str, Any]] = {}
-		
-		for event in self._events:
-			sessions = event.get("sessions")
-			if not sessions or not isinstance(sessions, list):
-				continue
-			for session in sessions:
-				platform = str(session.get("platform") or "").strip()
-				if not platform or platform in venues_dict:
-					continue
-				lat, lon = session.get("latitude"), session.get("longitude")
-				if lat is not None and lon is not None:
-					try:
-						lat, lon = float(lat), float(lon)
-						venues_dict[platform] = {
-							"platform": platform,
-							"latitude": lat,
-							"longitude": lon,
-							"google_maps_url": f"https://www.google.com/maps/search/?api=1&query={lat},{lon}"
-						}
-					except (ValueError, TypeError):
-						continue
-		
-		return sorted(venues_dict.values(), key=lambda x: x["platform"])
+		"""All unique venues with coordinates, sorted by platform (read-only)."""
+		return self.ensure_loaded().venues
+
+	def render_venues(self) -> bytes:
+		"""Serialized get_all_venues(), rendered once per snapshot."""
+		return self.ensure_loaded().venues_json
 
 	def filter_events(
 		self, *,
@@ -217,59 +578,212 @@ class EventsDataStore:
 		limit: Optional[int] = None,
 		offset: int = 0,
 		sort: str = "start_desc",
+		text: Optional[str] = None,
+		after: Optional[Tuple[int, str]] = None,
 	) -> List[Dict[str, Any]]:
-		self.ensure_loaded()
-		if not self._events:
+		"""Events matching the filters in sort order.
+
+		text is a keyword query (see TextIndex). sort="relevance" ranks its
+		matches by score, newest first among equal scores, and falls back to
+		start_desc without text. after is a (start_timestamp, event_id) cursor:
+		results resume right after that event, then offset and limit apply.
+		"""
+		if sort not in SORT_ORDERS and sort != "relevance":
+			raise ValueError(f"Unknown sort '{sort}'")
+		text = normalize_text(text).strip() if text else ""
+		if sort == "relevance" and not text:
+			sort = "start_desc"
+		snap = self.ensure_loaded()
+		if not snap.events:
 			return []
+		if offset < 0:
+			offset = 0
 
-		candidate_indices: Optional[set[int]] = None
+		key = (
+			tuple(sorted(set(categories or ()))),
+			tuple(sorted(set(ticket_types or ()))),
+			start_timestamp_min,
+			end_timestamp_max,
+			sort,
+			text,
+		)
+		if not key[0] and not key[1] and start_timestamp_min is None and end_timestamp_max is None and not text:
+			ordered = snap.orders[sort]
+			begin = (snap.cursor_rank(sort, *after) if after is not None else -1) + 1 + offset
+		else:
+			cached = self.query_cache.get(snap.generation, key)
+			if cached is not None:
+				ordered = cached
+			else:
+				bitmap = self._match_bitmap(snap, *key[:4])
+				scores: Dict[int, float] = {}
+				if text:
+					scores = snap.text_index.search(text)
+					bitmap &= snap.columns.bitmap_of(scores)
+				needed = offset + limit if limit else None
+				if sort == "relevance":
+					ordered = sorted(snap.columns.indices(bitmap), key=scores.__getitem__, reverse=True)
+				# First pages of a query are read straight off the bitmap; once a
+				# client pages on with a cursor the full order is built and cached.
+				elif after is None and needed is not None and needed * PARTIAL_SELECT_RATIO <= bitmap_count(bitmap):
+					top = snap.columns.indices(bitmap, sort, limit=needed)
+					return [snap.events[i] for i in top[offset:]]
+				else:
+					ordered = snap.columns.indices(bitmap, sort)
+				self.query_cache.put(snap.generation, key, ordered)
+			if after is None:
+				begin = offset
+			elif sort == "relevance":
+				# Scores are per query, so the cursor's event is looked up in the result.
+				after_idx = snap.event_id_to_index.get(after[1])
+				begin = (ordered.index(after_idx) + 1 if after_idx in ordered else len(ordered)) + offset
+			else:
+				begin = _first_ranked_after(ordered, snap.ranks[sort], snap.cursor_rank(sort, *after)) + offset
 
-		if categories:
-			cat_set = set[int]()
-			for cat in categories:
-				if cat in self._category_to_indices:
-					cat_set.update(self._category_to_indices[cat])
-			candidate_indices = cat_set if candidate_indices is None else (candidate_indices & cat_set)
+		if limit is None or limit == 0:
+			return [snap.events[i] for i in ordered[begin:]]
+		return [snap.events[i] for i in ordered[begin:begin + limit]]
 
-		if ticket_types:
-			tt_set = set[int]()
-			for tt in ticket_types:
-				if tt in self._ticket_type_to_indices:
-					tt_set.update(self._ticket_type_to_indices[tt])
-			candidate_indices = tt_set if candidate_indices is None else (candidate_indices & tt_set)
+	def facets(
+		self, *,
+		categories: Optional[Sequence[str]] = None,
+		ticket_types: Optional[Sequence[str]] = None,
+		start_timestamp_min: Optional[int] = None,
+		end_timestamp_max: Optional[int] = None,
+		text: Optional[str] = None,
+		calendar: Optional[str] = None,
+	) -> Dict[str, Any]:
+		"""Counts of the events matching the filters, per category, ticket type and day/week.
 
-		if candidate_indices is None:
-			candidate_indices = set(range(len(self._events)))
+		Each dimension's counts apply every filter except its own, so a UI can
+		show how many results picking another value would give. calendar
+		("day" or "week") adds a histogram of the matches.
+		"""
+		snap = self.ensure_loaded()
+		columns = snap.columns
+		category_bitmap = columns.category.bitmap_any(categories) if categories else columns.all
+		ticket_type_bitmap = columns.ticket_type.bitmap_any(ticket_types) if ticket_types else columns.all
+		rest = self._match_bitmap(snap, (), (), start_timestamp_min, end_timestamp_max)
+		text = normalize_text(text).strip() if text else ""
+		if text:
+			rest &= columns.bitmap_of(snap.text_index.search(text))
+		matched = category_bitmap & ticket_type_bitmap & rest
 
-		filtered = [i for i in candidate_indices if self._has_valid_session_in_timeframe(
-			self._events[i], start_timestamp_min, end_timestamp_max
-		)]
+		def value_counts(bitmaps: Dict[str, int], others: int, selected: Optional[Sequence[str]]) -> List[Dict[str, Any]]:
+			counts: List[Dict[str, Any]] = [
+				{"value": value, "count": bitmap_count(bitmap & others)}
+				for value, bitmap in bitmaps.items()
+			]
+			counts = [c for c in counts if c["count"] or c["value"] in (selected or ())]
+			counts.sort(key=lambda c: (-c["count"], c["value"]))
+			return counts
 
-		if sort == "start_desc":
-			filtered.sort(key=lambda i: int(self._events[i].get("start_timestamp") or 0), reverse=True)
-		elif sort == "start_asc":
-			filtered.sort(key=lambda i: int(self._events[i].get("start_timestamp") or 0))
+		result: Dict[str, Any] = {
+			"total": bitmap_count(matched),
+			"category": value_counts(columns.category.bitmaps, ticket_type_bitmap & rest, categories),
+			"ticket_type": value_counts(columns.ticket_type.bitmaps, category_bitmap & rest, ticket_types),
+		}
+		if calendar:
+			result["calendar"] = {
+				"unit": calendar,
+				"timezone": "Asia/Taipei",
+				"buckets": snap.calendar.histogram(matched, calendar, start_timestamp_min, end_timestamp_max),
+			}
+		return result
 
-		if offset < 0:
-			offset = 0
-		if limit is None or limit == 0:
-			return [self._events[i] for i in filtered[offset:]]
-		return [self._events[i] for i in filtered[offset:offset + limit]]
+	@staticmethod
+	def _match_bitmap(
+		snap: EventsSnapshot,
+		categories: Sequence[str],
+		ticket_types: Sequence[str],
+		start_timestamp_min: Optional[int],
+		end_timestamp_max: Optional[int],
+	) -> int:
+		"""Columns bitmap of the events matching every given filter."""
+		columns = snap.columns
+		bitmap = columns.all
+		if categories:
+			bitmap &= columns.category.bitmap_any(categories)
+		if ticket_types:
+			bitmap &= columns.ticket_type.bitmap_any(ticket_types)
+		if start_timestamp_min is not None or end_timestamp_max is not None:
+			bitmap &= snap.timeframe_bitmap(start_timestamp_min, end_timestamp_max)
+		return bitmap
 
 	@staticmethod
 	def transform_image_urls(events: List[Dict[str, Any]], base_url: Optional[str] = None) -> List[Dict[str, Any]]:
 		"""Replace image URLs with local API endpoints."""
 		if base_url is None:
 			base_url = API_BASE_URL
-		transformed = []
-		for event in events:
-			event_copy = event.copy()
-			local_path = event.get("local_image_path", "")
-			if local_path:
-				filename = local_path.replace("\\", "/").split("/")[-1]
-				event_copy["image_url"] = f"{base_url}/images/{filename}"
-			transformed.append(event_copy)
-		return transformed
+		return [with_local_image_url(event, base_url) for event in events]
+
+	def _render(self, snap: EventsSnapshot, event: Dict[str, Any], base_url: str, projection: Projection = None) -> bytes:
+		idx = snap.index_of(event)
+		if idx is None:
+			return orjson.dumps(project(with_local_image_url(event, base_url), projection))
+		return snap.render_event(idx, base_url, projection)
+
+	def render_event(self, event: Dict[str, Any], base_url: Optional[str] = None) -> bytes:
+		"""Serialize one event with local image URLs, reusing cached fragments."""
+		return self._render(self._snapshot, event, base_url or API_BASE_URL)
+
+	def render_events(
+		self, events: Sequence[Dict[str, Any]], base_url: Optional[str] = None, projection: Projection = None
+	) -> bytes:
+		"""Serialize events as a JSON array by joining cached per-event fragments.
+
+		Produces the same bytes as serializing transform_image_urls(events),
+		each reduced to projection if one is given.
+		"""
+		snap = self._snapshot
+		base_url = base_url or API_BASE_URL
+		return b"[" + b",".join([self._render(snap, event, base_url, projection) for event in events]) + b"]"
+
+	def render_with_distances(
+		self,
+		hits: Sequence[Tuple[Dict[str, Any], float]],
+		base_url: Optional[str] = None,
+		projection: Projection = None,
+	) -> bytes:
+		"""render_events() of get_nearby() results, each event with a distance_m key added."""
+		snap = self._snapshot
+		base_url = base_url or API_BASE_URL
+		parts = []
+		for event, distance in hits:
+			fragment = self._render(snap, event, base_url, projection)
+			extra = b'"distance_m":' + orjson.dumps(round(distance)) + b"}"
+			parts.append(fragment[:-1] + (extra if fragment == b"{}" else b"," + extra))
+		return b"[" + b",".join(parts) + b"]"
+
+	def stream_events(
+		self,
+		events: Iterable[Dict[str, Any]],
+		base_url: Optional[str] = None,
+		ndjson: bool = False,
+		projection: Projection = None,
+	) -> Iterator[bytes]:
+		"""Yield render_events(events), or one event per line if ndjson, in chunks.
 
+		Only about STREAM_CHUNK_BYTES of output is held at a time, however many
+		events there are.
+		"""
+		snap = self._snapshot
+		base_url = base_url or API_BASE_URL
+		chunk: List[bytes] = [] if ndjson else [b"["]
+		size = 0
+		for i, event in enumerate(events):
+			fragment = self._render(snap, event, base_url, projection)
+			if ndjson:
+				chunk += (fragment, b"\n")
+			else:
+				chunk += (b",", fragment) if i else (fragment,)
+			size += len(fragment) + 1
+			if size >= STREAM_CHUNK_BYTES:
+				yield b"".join(chunk)
+				chunk, size = [], 0
+		if not ndjson:
+			chunk.append(b"]")
+		if chunk:
+			yield b"".join(chunk)
 
 events_store = EventsDataStore()
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .columns import EventColumns, bitmap_count, bitmap_from_positions
+
+# Asia/Taipei has been UTC+8 without daylight saving since 1979, so calendar
+# days are plain offsets of the Unix epoch.
+TAIPEI_UTC_OFFSET_S = 8 * 3600
+SECONDS_PER_DAY = 86400
+# Sessions spanning more days than this (long-running exhibitions with a far
+# away end date) are only counted on their first MAX_SESSION_DAYS days.
+MAX_SESSION_DAYS = 366
+
+_EPOCH = date(1970, 1, 1)
+
+# A bitmap stored as (shift, bits): bit p of the full bitmap is bit p - shift
+# of bits. Events on one day sit close together in start order, so this is
+# much smaller than a bitmap over every event.
+CompactBitmap = Tuple[int, int]
+
+
+def local_day(timestamp: int) -> int:
+	"""Days since 1970-01-01 of timestamp's date in Asia/Taipei."""
+	return (timestamp + TAIPEI_UTC_OFFSET_S) // SECONDS_PER_DAY
+
+
+def week_start(day: int) -> int:
+	"""Monday of day's week (1970-01-01 was a Thursday)."""
+	return day - (day + 3) % 7
+
+
+def day_label(day: int) -> str:
+	return (_EPOCH + timedelta(days=day)).isoformat()
+
+
+def _compact(positions: Sequence[int]) -> CompactBitmap:
+	shift = min(positions)
+	return shift, bitmap_from_positions([pos - shift for pos in positions], max(positions) - shift + 1)
+
+
+def _count(bitmap: int, compact: CompactBitmap) -> int:
+	shift, bits = compact
+	return bitmap_count((bitmap >> shift) & bits)
+
+
+class SessionCalendar:
+	"""Per-day and per-week bitmaps of the events with a session on that day or week.
+
+	Days are Asia/Taipei calendar days; a session counts on every day from its
+	start to its end. Bitmaps use the EventColumns bit positions, so counting
+	the matches of a filter on a day is one & and a popcount.
+	"""
+
+	def __init__(
+		self,
+		columns: EventColumns,
+		session_owner: Sequence[int],
+		session_starts: Sequence[int],
+		session_ends: Sequence[int],
+	) -> None:
+		position = columns.position
+		days: Dict[int, List[int]] = {}
+		for session_id, idx in enumerate(session_owner):
+			start = session_starts[session_id]
+			if start <= 0:
+				continue
+			first = local_day(start)
+			last = min(local_day(max(session_ends[session_id], start)), first + MAX_SESSION_DAYS - 1)
+			for day in range(first, last + 1):
+				days.setdefault(day, []).append(position[idx])
+		weeks: Dict[int, List[int]] = {}
+		for day, positions in days.items():
+			weeks.setdefault(week_start(day), []).extend(positions)
+		self.days: Dict[int, CompactBitmap] = {day: _compact(days[day]) for day in sorted(days)}
+		self.weeks: Dict[int, CompactBitmap] = {week: _compact(weeks[week]) for week in sorted(weeks)}
+
+	def histogram(
+		self, bitmap: int, unit: str = "day", start_timestamp: Optional[int] = None, end_timestamp: Optional[int] = None
+	) -> List[Dict[str, object]]:
+		"""Non-zero counts of bitmap's events per day (or week), within the time range if given."""
+		buckets = self.weeks if unit == "week" else self.days
+		first = local_day(start_timestamp) if start_timestamp is not None else None
+		last = local_day(end_timestamp) if end_timestamp is not None else None
+		if unit == "week":
+			first = week_start(first) if first is not None else None
+			last = week_start(last) if last is not None else None
+		result: List[Dict[str, object]] = []
+		for key, compact in buckets.items():
+			if (first is not None and key < first) or (last is not None and key > last):
+				continue
+			count = _count(bitmap, compact)
+			if count:
+				result.append({"date": day_label(key), "count": count})
+		return result
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import os
+from contextlib import contextmanager
+from typing import IO, Iterator, Optional
+
+try:
+	import fcntl
+except ImportError:  # Windows: no advisory locks, callers fall back to unlocked behaviour
+	fcntl = None  # type: ignore[assignment]
+
+
+def _open_lock_file(path: str) -> IO[bytes]:
+	os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+	return open(path, "a+b")
+
+
+@contextmanager
+def exclusive_lock(path: str) -> Iterator[None]:
+	"""Hold an exclusive cross-process lock on path for the duration of the block."""
+	f = _open_lock_file(path)
+	try:
+		if fcntl is not None:
+			fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+		yield
+	finally:
+		f.close()
+
+
+def try_exclusive_lock(path: str) -> Optional[IO[bytes]]:
+	"""Take an exclusive lock on path without blocking.
+
+	Returns the open lock file, which holds the lock until closed, or None if
+	another process (or another open of the file) already holds it.
+	"""
+	f = _open_lock_file(path)
+	if fcntl is None:
+		return f
+	try:
+		fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+	except BlockingIOError:
+		f.close()
+		return None
+	return f
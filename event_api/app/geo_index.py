@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import math
+from array import array
+from typing import Dict, Iterable, List, Tuple
+
+EARTH_RADIUS_M = 6_371_008.8
+# Farthest two points on Earth can be apart.
+MAX_DISTANCE_M = math.pi * EARTH_RADIUS_M
+METERS_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_M / 180.0
+
+# Grid cell size in degrees: about 1.1 km north-south, 1 km east-west in Taipei.
+CELL_DEG = 0.01
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+	"""Great-circle distance in meters."""
+	phi1, phi2 = math.radians(lat1), math.radians(lat2)
+	dphi = phi2 - phi1
+	dlambda = math.radians(lon2 - lon1)
+	a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+	return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GeoIndex:
+	"""Uniform latitude/longitude grid over point coordinates.
+
+	Points are bucketed into CELL_DEG x CELL_DEG cells; a radius query visits
+	only the cells overlapping the circle's bounding box (or, for very large
+	radii, only the occupied cells) and measures exact distances there.
+	"""
+
+	def __init__(self, points: Iterable[Tuple[int, float, float]]) -> None:
+		"""points are (id, latitude, longitude)."""
+		self.ids = array("q")
+		self.lats = array("d")
+		self.lons = array("d")
+		cells: Dict[Tuple[int, int], List[int]] = {}
+		for point_id, lat, lon in points:
+			cells.setdefault(self._cell(lat, lon), []).append(len(self.ids))
+			self.ids.append(point_id)
+			self.lats.append(lat)
+			self.lons.append(lon)
+		self.cells: Dict[Tuple[int, int], array] = {cell: array("q", slots) for cell, slots in cells.items()}
+
+	def __len__(self) -> int:
+		return len(self.ids)
+
+	@staticmethod
+	def _cell(lat: float, lon: float) -> Tuple[int, int]:
+		return math.floor(lat / CELL_DEG), math.floor(lon / CELL_DEG)
+
+	def within(self, lat: float, lon: float, radius_m: float) -> List[Tuple[float, int]]:
+		"""(distance in meters, id) of every point within radius_m, unordered."""
+		dlat = radius_m / METERS_PER_DEGREE_LAT
+		cos_lat = math.cos(math.radians(lat))
+		dlon = dlat / cos_lat if cos_lat > 1e-6 else 360.0
+		lat_lo, lon_lo = self._cell(lat - dlat, lon - dlon)
+		lat_hi, lon_hi = self._cell(lat + dlat, lon + dlon)
+		box_cells = (lat_hi - lat_lo + 1) * (lon_hi - lon_lo + 1)
+		slot_lists: Iterable[array]
+		if dlon >= 180.0 or box_cells > len(self.cells):
+			# Box wraps around or is mostly empty: scan the occupied cells instead.
+			slot_lists = self.cells.values()
+		else:
+			slot_lists = [
+				self.cells[cell]
+				for cell in ((i, j) for i in range(lat_lo, lat_hi + 1) for j in range(lon_lo, lon_hi + 1))
+				if cell in self.cells
+			]
+		lats, lons, ids = self.lats, self.lons, self.ids
+		hits: List[Tuple[float, int]] = []
+		for slots in slot_lists:
+			for slot in slots:
+				distance = haversine_m(lat, lon, lats[slot], lons[slot])
+				if distance <= radius_m:
+					hits.append((distance, ids[slot]))
+		return hits
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+from .config import API_BASE_URL, THUMBNAIL_WIDTH
+from .projection import VIEWS
+
+# Bump whenever rendered event JSON changes for the same data (fields added,
+# renamed or reshaped, different URLs), so tags issued for old bodies stop
+# matching after the deploy.
+RENDER_FORMAT_VERSION = 1
+
+
+def http_date(timestamp: float) -> str:
+	return formatdate(timestamp, usegmt=True)
+
+
+def render_fingerprint() -> str:
+	"""Everything besides the data and the request that decides a rendered body."""
+	views = ";".join(f"{name}={','.join(fields)}" for name, fields in sorted(VIEWS.items()))
+	return f"v{RENDER_FORMAT_VERSION}|thumb={THUMBNAIL_WIDTH}|base={API_BASE_URL}|{views}"
+
+
+RENDER_FINGERPRINT = render_fingerprint()
+
+
+def data_etag(
+	source_hash: str,
+	path: str,
+	query: Iterable[Tuple[str, str]],
+	base_url: str = "",
+	media_type: str = "",
+	variant: str = "",
+	render: Optional[str] = None,
+) -> str:
+	"""Weak ETag for a response derived only from the events data and the request.
+
+	Query parameters are sorted so equivalent URLs share a tag; the data is
+	identified by its content hash, so every worker computes the same tag.
+	variant names anything else the body depends on (e.g. the trending ids);
+	render (default: RENDER_FINGERPRINT) ties the tag to how bodies are rendered.
+	"""
+	parts = [RENDER_FINGERPRINT if render is None else render, path, base_url, media_type, *(f"{name}={value}" for name, value in sorted(query))]
+	if variant:
+		parts.append(f"#{variant}")
+	key = "\n".join(parts)
+	digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+	return f'W/"{source_hash[:16]}-{digest}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+	"""Weak comparison of an If-None-Match header value against etag."""
+	if if_none_match.strip() == "*":
+		return True
+	target = etag.removeprefix("W/")
+	return any(tag.strip().removeprefix("W/") == target for tag in if_none_match.split(","))
+
+
+def is_not_modified(headers: Mapping[str, str], etag: str, last_modified: Optional[float] = None) -> bool:
+	"""Whether a conditional GET with these request headers can be answered with 304.
+
+	If-None-Match takes precedence; If-Modified-Since is only consulted when it
+	is absent and the resource has a modification time.
+	"""
+	if_none_match = headers.get("if-none-match")
+	if if_none_match is not None:
+		return etag_matches(if_none_match, etag)
+	if_modified_since = headers.get("if-modified-since")
+	if if_modified_since and last_modified is not None:
+		try:
+			return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+		except (TypeError, ValueError):
+			return False
+	return False
+
+
+def negotiate_encoding(accept_encoding: str, available: Sequence[str]) -> Optional[str]:
+	"""Content coding of available the client prefers per Accept-Encoding, or None for identity.
+
+	Codings with equal q-values are picked in the order of available.
+	"""
+	qualities: Dict[str, float] = {}
+	for part in accept_encoding.split(","):
+		name, _, params = part.partition(";")
+		name = name.strip().lower()
+		if not name:
+			continue
+		quality = 1.0
+		params = params.strip()
+		if params.startswith("q="):
+			try:
+				quality = float(params[2:])
+			except ValueError:
+				quality = 0.0
+		qualities[name] = quality
+	best, best_quality = None, 0.0
+	for coding in available:
+		quality = qualities.get(coding, qualities.get("*", 0.0))
+		if quality > best_quality:
+			best, best_quality = coding, quality
+	return best
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import mimetypes
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from .config import IMAGE_MEMORY_CACHE_BYTES, IMAGES_DIR_PATH, IMAGES_RESCAN_INTERVAL
+from .http_cache import http_date
+
+# Scraped images are named after their event UUID and never rewritten, so
+# clients and CDNs may keep them forever; anything else gets a short lifetime.
+_IMMUTABLE_NAME = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.[A-Za-z0-9]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+
+# Images are kept in memory once requested this many times (or preloaded).
+MEMORY_ADMIT_AFTER_HITS = 2
+
+
+class ImageEntry:
+	"""Metadata of one file in the images directory, captured at scan time."""
+
+	__slots__ = ("name", "path", "size", "mtime", "etag", "media_type", "headers")
+
+	def __init__(self, name: str, path: str, size: int, mtime_ns: int) -> None:
+		self.name = name
+		self.path = path
+		self.size = size
+		self.mtime = mtime_ns / 1e9
+		self.etag = f'"{mtime_ns:x}-{size:x}"'
+		self.media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+		self.headers: Dict[str, str] = {
+			"ETag": self.etag,
+			"Last-Modified": http_date(self.mtime),
+			"Cache-Control": IMMUTABLE_CACHE_CONTROL if _IMMUTABLE_NAME.match(name) else DEFAULT_CACHE_CONTROL,
+		}
+
+	def variant_etag(self, variant_key: str) -> str:
+		return f'"{self.etag[1:-1]}-{variant_key}"'
+
+
+class ImageStore:
+	"""Index of the images directory plus a byte-bounded in-memory LRU of hot images.
+
+	Lookups are dict hits against the last scan, so unknown names (including any
+	path traversal attempt) are rejected without touching the disk. The
+	directory's mtime is re-checked at most every rescan_interval seconds and
+	the index rebuilt when it changed.
+	"""
+
+	def __init__(
+		self,
+		images_dir: Optional[str] = None,
+		memory_bytes: Optional[int] = None,
+		rescan_interval: Optional[float] = None,
+	) -> None:
+		self._images_dir: str = images_dir or IMAGES_DIR_PATH
+		self._memory_bytes: int = memory_bytes if memory_bytes is not None else IMAGE_MEMORY_CACHE_BYTES
+		self._rescan_interval: float = rescan_interval if rescan_interval is not None else IMAGES_RESCAN_INTERVAL
+		self._lock = threading.Lock()
+		self._entries: Dict[str, ImageEntry] = {}
+		self._dir_mtime_ns: Optional[int] = None
+		self._next_check = 0.0
+		self._memory: OrderedDict[str, bytes] = OrderedDict()
+		self._memory_used = 0
+		self._hits: Dict[str, int] = {}
+		self.memory_hits = 0
+		self.memory_misses = 0
+
+	def _scan(self) -> None:
+		entries: Dict[str, ImageEntry] = {}
+		try:
+			with os.scandir(self._images_dir) as it:
+				for dir_entry in it:
+					if dir_entry.is_file() and not dir_entry.name.startswith("."):
+						st = dir_entry.stat()
+						entries[dir_entry.name] = ImageEntry(dir_entry.name, dir_entry.path, st.st_size, st.st_mtime_ns)
+		except FileNotFoundError:
+			pass
+		with self._lock:
+			self._entries = entries
+			self._memory = OrderedDict(
+				(name, body) for name, body in self._memory.items()
+				if name in entries and len(body) == entries[name].size
+			)
+			self._memory_used = sum(len(body) for body in self._memory.values())
+			self._hits = {}
+
+	def _maybe_rescan(self) -> None:
+		now = time.monotonic()
+		if now < self._next_check:
+			return
+		self._next_check = now + self._rescan_interval
+		try:
+			dir_mtime_ns = os.stat(self._images_dir).st_mtime_ns
+		except OSError:
+			dir_mtime_ns = None
+		if dir_mtime_ns != self._dir_mtime_ns or not self._entries:
+			self._dir_mtime_ns = dir_mtime_ns
+			self._scan()
+
+	def lookup(self, filename: str) -> Optional[ImageEntry]:
+		self._maybe_rescan()
+		return self._entries.get(filename)
+
+	def _admit(self, entry: ImageEntry) -> Optional[bytes]:
+		if entry.size > self._memory_bytes // 4:
+			return None
+		try:
+			with open(entry.path, "rb") as f:
+				body = f.read()
+		except OSError:
+			return None
+		with self._lock:
+			if entry.name not in self._memory:
+				self._memory[entry.name] = body
+				self._memory_used += len(body)
+			while self._memory_used > self._memory_bytes:
+				_, evicted = self._memory.popitem(last=False)
+				self._memory_used -= len(evicted)
+		return body
+
+	def read(self, entry: ImageEntry) -> Optional[bytes]:
+		"""Image bytes from memory, or None if the caller should stream the file.
+
+		Files are admitted to memory once they have been requested
+		MEMORY_ADMIT_AFTER_HITS times, so one-off requests do not evict hot images.
+		"""
+		with self._lock:
+			body = self._memory.get(entry.name)
+			if body is not None:
+				self._memory.move_to_end(entry.name)
+				self.memory_hits += 1
+				return body
+			self.memory_misses += 1
+			hits = self._hits.get(entry.name, 0) + 1
+			self._hits[entry.name] = hits
+		if hits < MEMORY_ADMIT_AFTER_HITS:
+			return None
+		return self._admit(entry)
+
+	def stats(self) -> Dict[str, int]:
+		with self._lock:
+			return {
+				"entries": len(self._memory),
+				"bytes": self._memory_used,
+				"hits": self.memory_hits,
+				"misses": self.memory_misses,
+			}
+
+	def preload(self, filenames: Iterable[str]) -> None:
+		"""Load these images into memory up front (e.g. the hot events' images)."""
+		for filename in filenames:
+			entry = self.lookup(filename)
+			if entry is not None:
+				self._admit(entry)
+
+
+image_store = ImageStore()
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import bisect
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple, Type
+
+try:
+	from PIL import Image
+except ImportError:  # Pillow is optional: without it originals are served as-is
+	Image = None  # type: ignore[assignment]
+
+from .config import (
+	IMAGE_CACHE_DIR,
+	IMAGE_CACHE_MAX_BYTES,
+	IMAGE_DEFAULT_QUALITY,
+	IMAGE_RESIZE_WORKERS,
+	IMAGES_DIR_PATH,
+)
+
+# Requested widths are rounded up to one of these so the cache holds a bounded
+# number of variants per image.
+VARIANT_WIDTHS = (160, 320, 480, 640, 960, 1280, 1920)
+
+VARIANT_FORMATS: Dict[str, Tuple[str, str]] = {
+	# fmt parameter -> (Pillow format, media type)
+	"jpeg": ("JPEG", "image/jpeg"),
+	"webp": ("WEBP", "image/webp"),
+	"png": ("PNG", "image/png"),
+}
+# Pillow formats that keep an alpha channel.
+ALPHA_FORMATS = ("PNG", "WEBP")
+
+if Image is not None:
+	# Undecodable, truncated or oversized sources, and encoder failures.
+	IMAGE_ERRORS: Tuple[Type[BaseException], ...] = (OSError, ValueError, Image.DecompressionBombError)
+else:
+	IMAGE_ERRORS = (OSError, ValueError)
+
+
+def snap_width(width: int) -> int:
+	"""Round a requested width up to the nearest supported variant width."""
+	pos = bisect.bisect_left(VARIANT_WIDTHS, width)
+	return VARIANT_WIDTHS[min(pos, len(VARIANT_WIDTHS) - 1)]
+
+
+def negotiate_format(accept: str) -> str:
+	"""Pick the variant format for a request without an explicit fmt."""
+	return "webp" if "image/webp" in accept else "jpeg"
+
+
+def convert_for(img: "Image.Image", pil_format: str) -> "Image.Image":
+	"""img in a mode pil_format can encode: RGB or L, or RGBA when it has alpha
+	and the format keeps it (CMYK, palette, 16-bit and float sources included)."""
+	if img.mode in ("RGB", "L"):
+		return img
+	has_alpha = img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+	if has_alpha and pil_format in ALPHA_FORMATS:
+		return img if img.mode == "RGBA" else img.convert("RGBA")
+	return img.convert("RGB")
+
+
+class ImageVariantStore:
+	"""Resized/re-encoded image variants kept in a size-bounded on-disk LRU cache.
+
+	Variants are generated in a thread pool on first request; concurrent
+	requests for the same variant share one job. When the cache grows past
+	max_bytes the least recently served variants are deleted. A source that
+	cannot be decoded or re-encoded is remembered (until it changes) and
+	get_variant returns None for it instead of retrying on every request.
+	"""
+
+	def __init__(
+		self,
+		images_dir: Optional[str] = None,
+		cache_dir: Optional[str] = None,
+		max_bytes: Optional[int] = None,
+		workers: Optional[int] = None,
+	) -> None:
+		self._images_dir: str = images_dir or IMAGES_DIR_PATH
+		self._cache_dir: str = cache_dir or IMAGE_CACHE_DIR
+		self._max_bytes: int = max_bytes if max_bytes is not None else IMAGE_CACHE_MAX_BYTES
+		self._workers: int = workers or IMAGE_RESIZE_WORKERS
+		self._lock = threading.Lock()
+		self._pool: Optional[ThreadPoolExecutor] = None
+		self._inflight: Dict[str, Future] = {}
+		self._failed: Dict[str, float] = {}  # variant path -> source mtime it failed for
+		self._lru: Optional[OrderedDict[str, int]] = None  # variant path -> size, oldest first
+		self._total_bytes = 0
+
+	@property
+	def available(self) -> bool:
+		return Image is not None
+
+	def _scan_cache(self) -> None:
+		"""Seed the LRU from files left by earlier runs, oldest access first."""
+		self._lru = OrderedDict()
+		self._total_bytes = 0
+		try:
+			entries = [e for e in os.scandir(self._cache_dir) if e.is_file() and not e.name.endswith(".tmp")]
+		except FileNotFoundError:
+			return
+		for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+			size = entry.stat().st_size
+			self._lru[entry.path] = size
+			self._total_bytes += size
+
+	def _touch(self, path: str) -> bool:
+		with self._lock:
+			if self._lru is None:
+				self._scan_cache()
+			assert self._lru is not None
+			if path not in self._lru:
+				return False
+			self._lru.move_to_end(path)
+			return True
+
+	def _record(self, path: str, size: int) -> None:
+		with self._lock:
+			assert self._lru is not None
+			self._total_bytes += size - self._lru.pop(path, 0)
+			self._lru[path] = size
+			while self._total_bytes > self._max_bytes and len(self._lru) > 1:
+				old_path, old_size = self._lru.popitem(last=False)
+				self._total_bytes -= old_size
+				try:
+					os.remove(old_path)
+				except OSError:
+					pass
+
+	@staticmethod
+	def variant_key(width: int, quality: Optional[int] = None, fmt: str = "jpeg") -> str:
+		"""Normalized name of a variant, e.g. "w320.q80.webp"."""
+		return f"w{snap_width(width)}.q{quality or IMAGE_DEFAULT_QUALITY}.{fmt}"
+
+	def _variant_path(self, filename: str, width: int, quality: int, fmt: str) -> str:
+		stem = os.path.splitext(filename)[0]
+		return os.path.join(self._cache_dir, f"{stem}.{self.variant_key(width, quality, fmt)}")
+
+	@staticmethod
+	def _source_mtime(source: str) -> float:
+		try:
+			return os.stat(source).st_mtime
+		except OSError:
+			return 0.0
+
+	def _generate(self, source: str, target: str, width: int, quality: int, fmt: str) -> Optional[str]:
+		pil_format = VARIANT_FORMATS[fmt][0]
+		tmp = f"{target}.{threading.get_ident()}.tmp"
+		try:
+			with Image.open(source) as src:
+				img: Image.Image = convert_for(src, pil_format)
+				if img.width > width:
+					img = img.resize((width, max(1, round(img.height * width / img.width))), Image.Resampling.LANCZOS)
+				os.makedirs(self._cache_dir, exist_ok=True)
+				img.save(tmp, format=pil_format, quality=quality, optimize=True)
+			os.replace(tmp, target)
+			self._record(target, os.path.getsize(target))
+			return target
+		except IMAGE_ERRORS as exc:
+			print(f"[images] cannot make {os.path.basename(target)}: {exc}")
+			try:
+				os.remove(tmp)
+			except OSError:
+				pass
+			with self._lock:
+				self._failed[target] = self._source_mtime(source)
+			return None
+		finally:
+			with self._lock:
+				self._inflight.pop(target, None)
+
+	def get_variant(self, filename: str, width: int, quality: Optional[int] = None, fmt: str = "jpeg") -> Optional[str]:
+		"""Path of the variant of images_dir/filename, generating it if needed.
+
+		Falls back to the original file when Pillow is not installed, and
+		returns None when the variant cannot be made from the original.
+		"""
+		source = os.path.join(self._images_dir, filename)
+		if not self.available:
+			return source
+		width = snap_width(width)
+		quality = quality or IMAGE_DEFAULT_QUALITY
+		target = self._variant_path(filename, width, quality, fmt)
+		known = self._touch(target)
+		if os.path.exists(target):
+			if not known:  # written by another worker process
+				self._record(target, os.path.getsize(target))
+			return target
+
+		with self._lock:
+			failed_for = self._failed.get(target)
+		if failed_for is not None:
+			if failed_for == self._source_mtime(source):
+				return None
+			with self._lock:
+				self._failed.pop(target, None)
+
+		with self._lock:
+			future = self._inflight.get(target)
+			if future is None:
+				if self._pool is None:
+					self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="image-resize")
+				future = self._pool.submit(self._generate, source, target, width, quality, fmt)
+				self._inflight[target] = future
+		return future.result()
+
+	def media_type(self, fmt: str) -> str:
+		return VARIANT_FORMATS[fmt][1]
+
+	def shutdown(self) -> None:
+		if self._pool is not None:
+			self._pool.shutdown(wait=True)
+			self._pool = None
+
+
+image_variants = ImageVariantStore()
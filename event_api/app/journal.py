@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import os
+import threading
+from array import array
+from typing import Any, Dict, Iterator, List, Optional
+
+import orjson
+
+
+class AppendOnlyJournal:
+	"""Newline-delimited JSON journal with group commit.
+
+	append() only queues a record and returns its sequence number, so callers
+	can order records under their own lock. wait_durable() then blocks until
+	the record is on disk: the first waiter becomes the leader and writes every
+	queued record with a single write + fsync while later waiters sleep, so
+	concurrent writers share one fsync.
+
+	truncate(upto) drops the records a snapshot covers while keeping any
+	appended after them, so the snapshot can be written without blocking
+	writers.
+	"""
+
+	def __init__(self, path: str) -> None:
+		self._path = path
+		self._cond = threading.Condition()
+		self._pending: List[bytes] = []
+		self._appended = 0
+		self._durable = 0
+		self._flushing = False
+		self._records = 0
+		self._base = 0  # sequence number of the last record dropped by truncate()
+		self._ends = array("q")  # file offset after each written record since then
+		os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+		self._file = open(path, "ab")
+		self._size = self._file.tell()
+		# Records already in the file when it was opened are replayed by the
+		# owner and so covered by its next snapshot, like those up to _base.
+		self._base_offset = self._size
+
+	@property
+	def path(self) -> str:
+		return self._path
+
+	def __len__(self) -> int:
+		"""Records written since the journal was last truncated."""
+		return self._records
+
+	@staticmethod
+	def replay(path: str) -> Iterator[Dict[str, Any]]:
+		"""Yield the records of a journal file, skipping a torn final line."""
+		try:
+			with open(path, "rb") as f:
+				lines = f.read().split(b"\n")
+		except FileNotFoundError:
+			return
+		for line in lines:
+			if not line:
+				continue
+			try:
+				record = orjson.loads(line)
+			except orjson.JSONDecodeError:
+				continue
+			if isinstance(record, dict):
+				yield record
+
+	def mark(self) -> int:
+		"""Sequence number of the last appended record, to pass to truncate() later."""
+		with self._cond:
+			return self._appended
+
+	def append(self, record: Dict[str, Any]) -> int:
+		line = orjson.dumps(record) + b"\n"
+		with self._cond:
+			self._pending.append(line)
+			self._appended += 1
+			self._records += 1
+			return self._appended
+
+	def wait_durable(self, seq: int) -> None:
+		with self._cond:
+			while self._durable < seq:
+				if self._flushing:
+					self._cond.wait()
+					continue
+				self._flushing = True
+				batch, self._pending = self._pending, []
+				upto = self._appended
+				self._cond.release()
+				try:
+					self._file.write(b"".join(batch))
+					self._file.flush()
+					os.fsync(self._file.fileno())
+				except BaseException:
+					try:
+						self._file.truncate(self._size)  # drop a torn write; the batch is retried
+					except OSError:
+						pass
+					self._cond.acquire()
+					self._pending[:0] = batch
+					self._flushing = False
+					self._cond.notify_all()
+					raise
+				self._cond.acquire()
+				for line in batch:
+					self._size += len(line)
+					self._ends.append(self._size)
+				self._flushing = False
+				self._durable = max(self._durable, upto)
+				self._cond.notify_all()
+
+	def truncate(self, upto: Optional[int] = None) -> None:
+		"""Drop the records up to sequence number upto (default: all), after the
+		caller has persisted a snapshot covering them."""
+		with self._cond:
+			while self._flushing:
+				self._cond.wait()
+			upto = self._appended if upto is None else max(upto, self._base)
+			durable = self._durable  # records up to here are in the file
+			if upto > durable:
+				# Covered by the snapshot before they reached the journal.
+				del self._pending[:upto - durable]
+				self._durable = upto
+			# _ends has an offset per written record, so only those index it.
+			written = min(upto, durable) - self._base
+			if upto >= durable:
+				keep_from = self._size
+			else:
+				keep_from = self._ends[written - 1] if written else self._base_offset
+			with open(self._path, "rb") as f:
+				f.seek(keep_from)
+				tail = f.read(self._size - keep_from)
+			tmp_path = self._path + ".tmp"
+			with open(tmp_path, "wb") as f:
+				f.write(tail)
+				f.flush()
+				os.fsync(f.fileno())
+			os.replace(tmp_path, self._path)
+			self._file.close()
+			self._file = open(self._path, "ab")
+			self._size = len(tail)
+			self._base_offset = 0
+			self._ends = array("q", [end - keep_from for end in self._ends[written:]])
+			self._base = upto
+			self._records = self._appended - upto
+			self._cond.notify_all()
+
+	def close(self) -> None:
+		self.wait_durable(self._appended)
+		self._file.close()
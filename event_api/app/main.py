@@ -1,19 +1,32 @@
-from typing import List, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Union
 
-from fastapi import FastAPI, HTTPException, Query, Request
+import orjson
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, ORJSONResponse
+from fastapi.responses import FileResponse, ORJSONResponse, Response, StreamingResponse
 
 from .config import (
 	DEFAULT_FILTER_LIMIT,
+	DEFAULT_HOT_AMOUNT,
 	DEFAULT_RANDOM_AMOUNT,
 	DEFAULT_RECENT_AMOUNT,
 	ENABLE_CORS,
+	ENABLE_METRICS,
+	EVENTS_RELOAD_INTERVAL,
 	HOT_EVENT_IDS,
-	IMAGES_DIR_PATH,
+	JSON_CACHE_CONTROL,
 	MAX_LIMIT,
+	PROFILE_TOKEN,
 )
-from .data_loader import events_store
+from .data_loader import events_store, image_filename
+from .http_cache import data_etag, is_not_modified, negotiate_encoding
+from .image_store import image_store
+from .image_variants import VARIANT_WIDTHS, image_variants, negotiate_format
+from .metrics import MetricFamily, RequestMetricsMiddleware, metrics
+from .pagination import cursor_after, decode_cursor
+from .profiling import ProfiledRoute, ProfilingMiddleware, stage
+from .projection import VIEWS, Projection, parse_projection
+from .response_cache import ENCODINGS, response_cache
 from .user_data_store import user_data_store
 
 
@@ -22,7 +35,81 @@ def get_base_url(request: Request) -> str:
 	return f"{request.url.scheme}://{request.url.netloc}"
 
 
+def hot_event_ids(amount: int) -> List[str]:
+	"""The amount most passported/favourited events, topped up from HOT_EVENT_IDS.
+
+	Counted events that are no longer in the events data are skipped.
+	"""
+	ranked = user_data_store.top_events(2 * amount)
+	ids = [event_id for event_id, _ in ranked if events_store.has_event(event_id)][:amount]
+	for event_id in HOT_EVENT_IDS:
+		if len(ids) >= amount:
+			break
+		if event_id not in ids and events_store.has_event(event_id):
+			ids.append(event_id)
+	return ids
+
+
+def json_response(body: bytes) -> Response:
+	"""Wrap already-serialized JSON bytes."""
+	return Response(content=body, media_type="application/json")
+
+
+def cached_json(
+	request: Request,
+	render: Callable[[], Union[bytes, Iterator[bytes]]],
+	extra_headers: Optional[Dict[str, str]] = None,
+	media_type: str = "application/json",
+	variant: str = "",
+) -> Response:
+	"""Serve render() tagged with an ETag for the current events data and query.
+
+	A matching If-None-Match is answered with 304 before render() runs.
+	extra_headers may be filled in by render() and are sent with its body; a
+	body given as an iterator of chunks is streamed. A body that also depends
+	on something other than the events data names it in variant.
+
+	Rendered bodies are kept in response_cache, compressed in the coding the
+	client accepts, so repeated requests for the same data skip rendering and
+	compression alike.
+	"""
+	with stage("etag"):
+		snapshot = events_store.ensure_loaded()
+		etag = data_etag(
+			snapshot.source_hash,
+			request.url.path,
+			request.query_params.multi_items(),
+			get_base_url(request),
+			media_type,
+			variant,
+		)
+	encoding = negotiate_encoding(request.headers.get("accept-encoding", ""), ENCODINGS)
+	vary = ", ".join(v for v in ((extra_headers or {}).get("Vary"), "Accept-Encoding") if v)
+	headers = {"ETag": etag, "Cache-Control": JSON_CACHE_CONTROL, **(extra_headers or {}), "Vary": vary}
+	if is_not_modified(request.headers, etag):
+		return Response(status_code=304, headers=headers)
+	cached = response_cache.get(snapshot.source_hash, etag, encoding or "identity")
+	if cached is not None:
+		body, body_headers = cached
+		return Response(content=body, media_type=media_type, headers={**headers, **body_headers})
+
+	with stage("render"):
+		rendered = render()
+	body_headers = {name: value for name, value in (extra_headers or {}).items() if name != "Vary"}
+	if not isinstance(rendered, bytes):
+		return StreamingResponse(rendered, media_type=media_type, headers={**headers, **body_headers})
+	with stage("compress"):
+		body, applied = response_cache.encode(rendered, encoding)
+	if applied:
+		body_headers["Content-Encoding"] = applied
+	response_cache.put(snapshot.source_hash, etag, encoding or "identity", body, body_headers)
+	return Response(content=body, media_type=media_type, headers={**headers, **body_headers})
+
+
 app = FastAPI(default_response_class=ORJSONResponse, title="Events API", version="2.0.0")
+if PROFILE_TOKEN:
+	# Must be set before the routes below are declared.
+	app.router.route_class = ProfiledRoute
 
 if ENABLE_CORS:
 	app.add_middleware(
@@ -31,15 +118,54 @@ if ENABLE_CORS:
 		allow_credentials=True,
 		allow_methods=["*"],
 		allow_headers=["*"],
+		expose_headers=["X-Next-Cursor"],
 	)
+if ENABLE_METRICS:
+	app.add_middleware(RequestMetricsMiddleware)
+if PROFILE_TOKEN:
+	app.add_middleware(ProfilingMiddleware, token=PROFILE_TOKEN)
+
+
+def _cache_metrics() -> List[MetricFamily]:
+	"""Generation and cache counters of this worker, read at scrape time."""
+	caches = {
+		"search": events_store.query_cache.stats(),
+		"response": response_cache.stats(),
+		"image_memory": image_store.stats(),
+	}
+	hits = [("", {"cache": name}, stats["hits"]) for name, stats in caches.items()]
+	misses = [("", {"cache": name}, stats["misses"]) for name, stats in caches.items()]
+	ratios = [
+		("", {"cache": name}, stats["hits"] / (stats["hits"] + stats["misses"]) if stats["hits"] + stats["misses"] else 0.0)
+		for name, stats in caches.items()
+	]
+	return [
+		("events_api_events_generation", "gauge", "Generation of the published events snapshot.", [("", {}, events_store.generation)]),
+		("events_api_cache_hits_total", "counter", "Cache lookups answered from the cache.", hits),
+		("events_api_cache_misses_total", "counter", "Cache lookups that missed.", misses),
+		("events_api_cache_hit_ratio", "gauge", "Hits over lookups since start.", ratios),
+	]
+
+
+metrics.register_collector(_cache_metrics)
 
 
 @app.on_event("startup")
 def _warmup() -> None:
 	try:
 		events_store.ensure_loaded()
+		hot_images = [image_filename(event) for event in events_store.get_events_by_ids(hot_event_ids(DEFAULT_HOT_AMOUNT))]
+		image_store.preload(name for name in hot_images if name)
 	except Exception as exc:
 		print(f"[startup] events preload failed: {exc}")
+	events_store.start_watcher(EVENTS_RELOAD_INTERVAL)
+
+
+@app.on_event("shutdown")
+def _shutdown() -> None:
+	events_store.stop_watcher()
+	user_data_store.close()
+	image_variants.shutdown()
 
 
 @app.get("/health")
@@ -47,14 +173,67 @@ def health() -> dict:
 	return {"status": "ok"}
 
 
+@app.get("/stats")
+def stats() -> dict:
+	"""Cache statistics of this worker."""
+	return {
+		"generation": events_store.generation,
+		"search_cache": events_store.query_cache.stats(),
+		"response_cache": response_cache.stats(),
+		"image_memory_cache": image_store.stats(),
+	}
+
+
+@app.get("/metrics")
+def get_metrics() -> Response:
+	"""Metrics of this worker in the Prometheus text format."""
+	return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/images/{filename}")
-def get_image(filename: str):
-	"""Serve cached event images."""
-	import os
-	file_path = os.path.join(IMAGES_DIR_PATH, filename)
-	if not os.path.exists(file_path):
+def get_image(
+	request: Request,
+	filename: str,
+	w: Optional[int] = Query(default=None, ge=1, le=4096, description="Resize to this width (rounded up to a supported size)"),
+	q: Optional[int] = Query(default=None, ge=1, le=95, description="Encoder quality"),
+	fmt: Optional[str] = Query(default=None, pattern="^(jpeg|webp|png)$", description="Output format (default: negotiated from Accept)"),
+):
+	"""Serve cached event images, optionally resized and re-encoded."""
+	entry = image_store.lookup(filename)
+	if entry is None:
 		raise HTTPException(status_code=404, detail="Image not found")
-	return FileResponse(file_path)
+
+	if (w is None and q is None and fmt is None) or not image_variants.available:
+		if is_not_modified(request.headers, entry.etag, entry.mtime):
+			return Response(status_code=304, headers=entry.headers)
+		body = image_store.read(entry)
+		if body is not None:
+			return Response(content=body, media_type=entry.media_type, headers=entry.headers)
+		return FileResponse(entry.path, media_type=entry.media_type, headers=entry.headers)
+
+	headers = dict(entry.headers)
+	if fmt is None:
+		fmt = negotiate_format(request.headers.get("accept", ""))
+		headers["Vary"] = "Accept"
+	width = w or VARIANT_WIDTHS[-1]
+	headers["ETag"] = entry.variant_etag(image_variants.variant_key(width, q, fmt))
+	if is_not_modified(request.headers, headers["ETag"], entry.mtime):
+		return Response(status_code=304, headers=headers)
+	variant_path = image_variants.get_variant(filename, width=width, quality=q, fmt=fmt)
+	if variant_path is None:
+		# Not decodable or not encodable as requested: the original, as stored.
+		return FileResponse(entry.path, media_type=entry.media_type, headers=entry.headers)
+	return FileResponse(variant_path, media_type=image_variants.media_type(fmt), headers=headers)
+
+
+def get_projection(
+	fields: Optional[str] = Query(default=None, description="Comma-separated top-level fields to return (event_id is always included)"),
+	view: Optional[str] = Query(default=None, pattern=f"^({'|'.join(VIEWS)})$", description="Predefined projection, e.g. card"),
+) -> Projection:
+	try:
+		return parse_projection(fields, view)
+	except ValueError as exc:
+		raise HTTPException(status_code=400, detail=str(exc))
 
 
 def clamp_amount(amount: int, *, default_amount: int) -> int:
@@ -71,35 +250,51 @@ def random_events(
 	amount: int = Query(default=DEFAULT_RANDOM_AMOUNT, ge=1, le=10_000),
 	seed: Optional[int] = Query(default=None),
 	distinct_venue: bool = Query(default=True, description="Return at most one event per venue"),
+	projection: Projection = Depends(get_projection),
 ):
 	"""Return random events."""
 	amount = clamp_amount(amount, default_amount=DEFAULT_RANDOM_AMOUNT)
 	events = events_store.get_random(amount=amount, seed=seed, distinct_venue=distinct_venue)
-	return events_store.transform_image_urls(events, base_url=get_base_url(request))
+	return json_response(events_store.render_events(events, base_url=get_base_url(request), projection=projection))
 
 
 @app.get("/recent")
 def recent_events(
 	request: Request,
 	amount: int = Query(default=DEFAULT_RECENT_AMOUNT, ge=1, le=10_000),
+	projection: Projection = Depends(get_projection),
 ):
 	"""Return most recent events by start_timestamp."""
 	amount = clamp_amount(amount, default_amount=DEFAULT_RECENT_AMOUNT)
-	events = events_store.get_recent(amount=amount)
-	return events_store.transform_image_urls(events, base_url=get_base_url(request))
+	return cached_json(
+		request,
+		lambda: events_store.render_events(
+			events_store.get_recent(amount=amount), base_url=get_base_url(request), projection=projection
+		),
+	)
 
 
 @app.get("/hot")
-def hot_events(request: Request):
-	"""Return curated featured events."""
-	events = events_store.get_events_by_ids(HOT_EVENT_IDS)
-	return events_store.transform_image_urls(events, base_url=get_base_url(request))
+def hot_events(
+	request: Request,
+	amount: int = Query(default=DEFAULT_HOT_AMOUNT, ge=1, le=MAX_LIMIT),
+	projection: Projection = Depends(get_projection),
+):
+	"""Return trending events: the most passported/favourited, or the curated list without any."""
+	event_ids = hot_event_ids(amount)
+	return cached_json(
+		request,
+		lambda: events_store.render_events(
+			events_store.get_events_by_ids(event_ids), base_url=get_base_url(request), projection=projection
+		),
+		variant=",".join(event_ids),
+	)
 
 
 @app.get("/venue")
-def get_all_venues():
+def get_all_venues(request: Request):
 	"""Return all unique venues with coordinates."""
-	return events_store.get_all_venues()
+	return cached_json(request, events_store.render_venues)
 
 
 @app.get("/search")
@@ -111,35 +306,140 @@ def search_events(
 	end_timestamp: Optional[int] = Query(default=None, description="Max end_timestamp"),
 	limit: Optional[int] = Query(default=DEFAULT_FILTER_LIMIT if DEFAULT_FILTER_LIMIT != 0 else None, description="Max items (0=unlimited)"),
 	offset: int = Query(default=0, ge=0, le=1_000_000),
-	sort: str = Query(default="start_desc", pattern="^(start_desc|start_asc)$"),
+	sort: Optional[str] = Query(
+		default=None, pattern="^(start_desc|start_asc|relevance)$", description="Default: relevance with q, else start_desc"
+	),
+	q: Optional[str] = Query(default=None, max_length=200, description="Keywords in title, description, organizer or venue"),
+	cursor: Optional[str] = Query(default=None, description="Continue after a previous page (its X-Next-Cursor header)"),
+	stream: bool = Query(default=False, description="Stream the JSON array in chunks"),
+	facets: bool = Query(default=False, description='Return {"events": [...], "facets": {...}} (see /facets)'),
+	projection: Projection = Depends(get_projection),
 ):
-	"""Search and filter events."""
+	"""Search and filter events.
+
+	Pages with a limit carry an X-Next-Cursor header while more results follow.
+	With stream=true, or Accept: application/x-ndjson (one event per line), the
+	body is streamed in chunks instead of being rendered in one piece.
+	"""
 	if limit is None or limit == 0:
 		effective_limit: Optional[int] = None
 	else:
 		if limit < 1:
 			raise HTTPException(status_code=400, detail="limit must be >= 1")
 		effective_limit = min(limit, MAX_LIMIT)
-	
-	events = events_store.filter_events(
-		categories=category,
-		ticket_types=ticket_type,
-		start_timestamp_min=start_timestamp,
-		end_timestamp_max=end_timestamp,
-		limit=effective_limit,
-		offset=offset,
-		sort=sort,
+	try:
+		after = decode_cursor(cursor) if cursor else None
+	except ValueError:
+		raise HTTPException(status_code=400, detail="Invalid cursor")
+	if sort is None:
+		sort = "relevance" if q else "start_desc"
+
+	ndjson = "application/x-ndjson" in request.headers.get("accept", "")
+	if facets and (stream or ndjson):
+		raise HTTPException(status_code=400, detail="facets=true cannot be combined with streaming")
+	page_headers: Dict[str, str] = {"Vary": "Accept"}
+
+	def render() -> Union[bytes, Iterator[bytes]]:
+		events = events_store.filter_events(
+			categories=category,
+			ticket_types=ticket_type,
+			start_timestamp_min=start_timestamp,
+			end_timestamp_max=end_timestamp,
+			# One extra result tells whether there is a next page.
+			limit=effective_limit + 1 if effective_limit else None,
+			offset=offset,
+			sort=sort,
+			text=q,
+			after=after,
+		)
+		if effective_limit and len(events) > effective_limit:
+			events = events[:effective_limit]
+			page_headers["X-Next-Cursor"] = cursor_after(events[-1])
+		if stream or ndjson:
+			return events_store.stream_events(events, base_url=get_base_url(request), ndjson=ndjson, projection=projection)
+		body = events_store.render_events(events, base_url=get_base_url(request), projection=projection)
+		if facets:
+			counts = events_store.facets(
+				categories=category,
+				ticket_types=ticket_type,
+				start_timestamp_min=start_timestamp,
+				end_timestamp_max=end_timestamp,
+				text=q,
+			)
+			body = b'{"events":' + body + b',"facets":' + orjson.dumps(counts) + b"}"
+		return body
+
+	return cached_json(request, render, page_headers, "application/x-ndjson" if ndjson else "application/json")
+
+
+@app.get("/facets")
+def facet_counts(
+	request: Request,
+	category: Optional[List[str]] = Query(default=None),
+	ticket_type: Optional[List[str]] = Query(default=None),
+	start_timestamp: Optional[int] = Query(default=None, description="Min start_timestamp"),
+	end_timestamp: Optional[int] = Query(default=None, description="Max end_timestamp"),
+	q: Optional[str] = Query(default=None, max_length=200),
+	calendar: Optional[str] = Query(default=None, pattern="^(day|week)$", description="Add an Asia/Taipei day or week histogram"),
+):
+	"""Counts per category and ticket_type (and day/week) for the /search filters."""
+	return cached_json(
+		request,
+		lambda: orjson.dumps(
+			events_store.facets(
+				categories=category,
+				ticket_types=ticket_type,
+				start_timestamp_min=start_timestamp,
+				end_timestamp_max=end_timestamp,
+				text=q,
+				calendar=calendar,
+			)
+		),
 	)
-	return events_store.transform_image_urls(events, base_url=get_base_url(request))
+
+
+@app.get("/nearby")
+def nearby_events(
+	request: Request,
+	lat: float = Query(..., ge=-90, le=90),
+	lon: float = Query(..., ge=-180, le=180),
+	radius_m: Optional[float] = Query(default=None, gt=0, le=100_000, description="Events within this distance"),
+	k: Optional[int] = Query(default=None, ge=1, le=10_000, description="Only the k nearest events"),
+	category: Optional[List[str]] = Query(default=None),
+	start_timestamp: Optional[int] = Query(default=None, description="Min session end_timestamp"),
+	end_timestamp: Optional[int] = Query(default=None, description="Max session start_timestamp"),
+	projection: Projection = Depends(get_projection),
+):
+	"""Events with a session near (lat, lon), nearest first, each with distance_m."""
+	if radius_m is None and k is None:
+		raise HTTPException(status_code=400, detail="radius_m or k is required")
+	k = min(k, MAX_LIMIT) if k is not None else None
+
+	def render() -> bytes:
+		hits = events_store.get_nearby(
+			lat,
+			lon,
+			radius_m=radius_m,
+			k=k,
+			categories=category,
+			start_timestamp_min=start_timestamp,
+			end_timestamp_max=end_timestamp,
+		)
+		return events_store.render_with_distances(hits[:MAX_LIMIT], base_url=get_base_url(request), projection=projection)
+
+	return cached_json(request, render)
 
 
 @app.get("/event/{event_id}")
 def get_event_by_id(request: Request, event_id: str):
 	"""Get a single event by ID."""
-	event = events_store.get_event_by_id(event_id)
-	if event is None:
-		raise HTTPException(status_code=404, detail=f"Event with ID '{event_id}' not found")
-	return events_store.transform_image_urls([event], base_url=get_base_url(request))[0]
+	def render() -> bytes:
+		event = events_store.get_event_by_id(event_id)
+		if event is None:
+			raise HTTPException(status_code=404, detail=f"Event with ID '{event_id}' not found")
+		return events_store.render_event(event, base_url=get_base_url(request))
+
+	return cached_json(request, render)
 
 
 @app.get("/platform/{platform_name}")
@@ -148,16 +448,20 @@ def get_events_by_platform(
 	platform_name: str,
 	start_timestamp: Optional[int] = Query(default=None, description="Min session start_timestamp"),
 	end_timestamp: Optional[int] = Query(default=None, description="Max session start_timestamp"),
+	projection: Projection = Depends(get_projection),
 ):
 	"""Get all events at a platform/venue."""
-	events = events_store.get_events_by_platform(
-		platform_name,
-		start_timestamp_min=start_timestamp,
-		end_timestamp_max=end_timestamp
-	)
-	if not events:
-		raise HTTPException(status_code=404, detail=f"No events found for platform '{platform_name}'")
-	return events_store.transform_image_urls(events, base_url=get_base_url(request))
+	def render() -> bytes:
+		events = events_store.get_events_by_platform(
+			platform_name,
+			start_timestamp_min=start_timestamp,
+			end_timestamp_max=end_timestamp
+		)
+		if not events:
+			raise HTTPException(status_code=404, detail=f"No events found for platform '{platform_name}'")
+		return events_store.render_events(events, base_url=get_base_url(request), projection=projection)
+
+	return cached_json(request, render)
 
 
 @app.get("/users/{uid}")
@@ -220,8 +524,8 @@ def root() -> dict:
 		"name": "Events API",
 		"version": "2.0.0",
 		"endpoints": {
-			"events": ["/random", "/recent", "/hot", "/venue", "/search", "/event/{id}", "/platform/{name}", "/images/{filename}"],
+			"events": ["/random", "/recent", "/hot", "/venue", "/search", "/facets", "/nearby", "/event/{id}", "/platform/{name}", "/images/{filename}"],
 			"users": ["/users/{uid}", "/users/{uid}/passport", "/users/{uid}/favourite"],
-			"utility": ["/health"],
+			"utility": ["/health", "/stats", "/metrics"],
 		},
 	}
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Histogram bucket upper bounds.
+LATENCY_BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUILD_BUCKETS: Tuple[float, ...] = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS: Tuple[float, ...] = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Routes are labelled by their path template; requests that match no route
+# share one label so arbitrary URLs cannot grow the series without bound.
+UNMATCHED_ROUTE = "unmatched"
+
+# (name, type, help, samples) where samples are (name suffix, labels, value);
+# what a collector returns at scrape time.
+MetricFamily = Tuple[str, str, str, Sequence[Tuple[str, Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+	return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+	if math.isinf(value):
+		return "+Inf" if value > 0 else "-Inf"
+	if value == int(value) and abs(value) < 1e15:
+		return str(int(value))
+	return repr(float(value))
+
+
+def _format_sample(name: str, labels: Dict[str, str], value: float) -> str:
+	if not labels:
+		return f"{name} {_format_value(value)}"
+	pairs = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+	return f"{name}{{{pairs}}} {_format_value(value)}"
+
+
+class Counter:
+	"""Monotonic count per label combination."""
+
+	def __init__(self, name: str, help: str, label_names: Sequence[str] = ()) -> None:
+		self.name = name
+		self.help = help
+		self.label_names = tuple(label_names)
+		self._lock = threading.Lock()
+		self._values: Dict[Tuple[str, ...], float] = {}
+
+	def inc(self, *label_values: str, amount: float = 1.0) -> None:
+		with self._lock:
+			self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+	def collect(self) -> MetricFamily:
+		with self._lock:
+			values = sorted(self._values.items())
+		samples = [("", dict(zip(self.label_names, key)), value) for key, value in values]
+		return self.name, "counter", self.help, samples
+
+
+class Histogram:
+	"""Cumulative bucket counts, sum and count of observations per label combination."""
+
+	def __init__(self, name: str, help: str, buckets: Sequence[float], label_names: Sequence[str] = ()) -> None:
+		self.name = name
+		self.help = help
+		self.buckets = tuple(sorted(buckets))
+		self.label_names = tuple(label_names)
+		self._lock = threading.Lock()
+		# label values -> [count per bucket (last one +Inf), sum]
+		self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+	def observe(self, value: float, *label_values: str) -> None:
+		slot = bisect_left(self.buckets, value)
+		with self._lock:
+			entry = self._values.get(label_values)
+			if entry is None:
+				entry = self._values[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+			entry[0][slot] += 1
+			entry[1][0] += value
+
+	def time(self, *label_values: str) -> "_Timer":
+		"""Context manager observing the seconds its block takes."""
+		return _Timer(self, label_values)
+
+	def collect(self) -> MetricFamily:
+		with self._lock:
+			values = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+		samples: List[Tuple[str, Dict[str, str], float]] = []
+		for key, (counts, total) in values:
+			labels = dict(zip(self.label_names, key))
+			cumulative = 0
+			for bound, count in zip(self.buckets + (math.inf,), counts):
+				cumulative += count
+				samples.append(("_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+			samples.append(("_sum", labels, total))
+			samples.append(("_count", labels, cumulative))
+		return self.name, "histogram", self.help, samples
+
+
+class _Timer:
+	def __init__(self, histogram: Histogram, label_values: Tuple[str, ...]) -> None:
+		self._histogram = histogram
+		self._label_values = label_values
+		self._start = 0.0
+
+	def __enter__(self) -> "_Timer":
+		self._start = time.perf_counter()
+		return self
+
+	def __exit__(self, *exc: Any) -> None:
+		self._histogram.observe(time.perf_counter() - self._start, *self._label_values)
+
+
+class MetricsRegistry:
+	"""Metrics of this process, rendered in the Prometheus text format.
+
+	Counters and histograms are updated as things happen; values that already
+	live elsewhere (cache statistics, the data generation) are read by
+	collectors at scrape time instead.
+	"""
+
+	def __init__(self) -> None:
+		self._metrics: List[Any] = []
+		self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+
+	def counter(self, name: str, help: str, label_names: Sequence[str] = ()) -> Counter:
+		counter = Counter(name, help, label_names)
+		self._metrics.append(counter)
+		return counter
+
+	def histogram(self, name: str, help: str, buckets: Sequence[float], label_names: Sequence[str] = ()) -> Histogram:
+		histogram = Histogram(name, help, buckets, label_names)
+		self._metrics.append(histogram)
+		return histogram
+
+	def register_collector(self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+		self._collectors.append(collector)
+
+	def render(self) -> str:
+		families: List[MetricFamily] = [metric.collect() for metric in self._metrics]
+		for collector in self._collectors:
+			families.extend(collector())
+		lines: List[str] = []
+		for name, kind, help, samples in families:
+			lines.append(f"# HELP {name} {help}")
+			lines.append(f"# TYPE {name} {kind}")
+			lines.extend(_format_sample(name + suffix, labels, value) for suffix, labels, value in samples)
+		return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+REQUESTS = metrics.counter("events_api_requests_total", "HTTP requests served.", ("route", "method", "status"))
+REQUEST_SECONDS = metrics.histogram(
+	"events_api_request_duration_seconds", "Time to the last byte of the response.", LATENCY_BUCKETS, ("route", "method")
+)
+RESPONSE_BYTES = metrics.histogram(
+	"events_api_response_size_bytes", "Response body bytes as sent (after compression).", SIZE_BUCKETS, ("route",)
+)
+
+EVENTS_RELOADS = metrics.counter(
+	"events_api_events_reloads_total", "Events snapshots published, by where they came from.", ("source",)
+)
+EVENTS_PARSE_SECONDS = metrics.histogram("events_api_events_parse_seconds", "Time to parse events.json.", BUILD_BUCKETS)
+EVENTS_INDEX_SECONDS = metrics.histogram(
+	"events_api_events_index_build_seconds", "Time to build a snapshot's indices.", BUILD_BUCKETS
+)
+USERDATA_LOCK_WAIT_SECONDS = metrics.histogram(
+	"events_api_userdata_lock_wait_seconds", "Time spent waiting for contended user data locks.", LATENCY_BUCKETS, ("lock",)
+)
+USERDATA_SAVE_SECONDS = metrics.histogram(
+	"events_api_userdata_save_seconds", "Time to make a user data change durable.", LATENCY_BUCKETS, ("kind",)
+)
+
+
+class RequestMetricsMiddleware:
+	"""ASGI middleware counting requests and timing them per route template."""
+
+	def __init__(self, app: Any) -> None:
+		self.app = app
+
+	async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+		if scope["type"] != "http":
+			await self.app(scope, receive, send)
+			return
+		start = time.perf_counter()
+		status = 500
+		size = 0
+
+		async def send_counted(message: Dict[str, Any]) -> None:
+			nonlocal status, size
+			if message["type"] == "http.response.start":
+				status = message["status"]
+			elif message["type"] == "http.response.body":
+				size += len(message.get("body", b""))
+			await send(message)
+
+		try:
+			await self.app(scope, receive, send_counted)
+		finally:
+			route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+			REQUESTS.inc(route, scope["method"], str(status))
+			REQUEST_SECONDS.observe(time.perf_counter() - start, route, scope["method"])
+			RESPONSE_BYTES.observe(size, route)
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import base64
+from typing import Any, Dict, Tuple
+
+import orjson
+
+
+def encode_cursor(start_timestamp: int, event_id: str) -> str:
+	"""Opaque /search cursor pointing just after the given event."""
+	raw = orjson.dumps([start_timestamp, event_id])
+	return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def cursor_after(event: Dict[str, Any]) -> str:
+	"""Cursor for the page that follows event."""
+	return encode_cursor(int(event.get("start_timestamp") or 0), str(event.get("event_id") or ""))
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+	"""Inverse of encode_cursor; raises ValueError for anything it did not produce."""
+	try:
+		raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+		start_timestamp, event_id = orjson.loads(raw)
+	except (ValueError, TypeError) as exc:
+		raise ValueError("invalid cursor") from exc
+	if not isinstance(start_timestamp, int) or not isinstance(event_id, str):
+		raise ValueError("invalid cursor")
+	return start_timestamp, event_id
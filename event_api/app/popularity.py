@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import math
+import threading
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# With a half-life, weights are 2**(WEIGHT_BITS + age in half-lives) relative
+# to an epoch that moves forward EPOCH_HALF_LIVES half-lives at a time: exact
+# integers (so sums do not depend on the order entries were counted in) that
+# fit SQLite's 64-bit INTEGER for millions of entries per event.
+WEIGHT_BITS = 16
+EPOCH_HALF_LIVES = 24
+# Cap for entries dated past the epoch span (clock skew, or an add racing a recount).
+MAX_WEIGHT_BITS = WEIGHT_BITS + EPOCH_HALF_LIVES + 8
+
+
+def decay_epoch(now: float, half_life: float) -> float:
+	"""Epoch weights are relative to at time now; the same in every process."""
+	if half_life <= 0:
+		return 0.0
+	span = EPOCH_HALF_LIVES * half_life
+	return math.floor(now / span) * span
+
+
+def popularity_weight(added_at: Any, half_life: float, epoch: float) -> int:
+	"""What one list entry added at added_at adds to its event's score.
+
+	1 without a half_life; otherwise it halves per half_life of age, so a
+	score ranks events by recent activity. Entries more than WEIGHT_BITS
+	half-lives older than the epoch weigh 0.
+	"""
+	if half_life <= 0:
+		return 1
+	return int(2.0 ** min(WEIGHT_BITS + ((added_at or 0) - epoch) / half_life, MAX_WEIGHT_BITS))
+
+
+class PopularityCounter:
+	"""Per-event popularity scores with a sorted-bucket top-k.
+
+	A score is the sum of popularity_weight over the event's passport and
+	favourite entries, so it is derived from stored added_at timestamps only
+	and a restart (or the SQLite backend) ranks exactly the same. Only the
+	order matters, so scores are not touched as time passes; they are
+	recounted from the entries when the epoch moves (see stale()).
+
+	Events with the same score share a bucket kept sorted by event_id (ties
+	rank by event_id) and the distinct scores are kept sorted, so an add or
+	remove moves one event between two buckets and top(k) reads k events
+	walking down from the highest score.
+	"""
+
+	def __init__(self, half_life: float = 0.0) -> None:
+		self._lock = threading.Lock()
+		self._scores: Dict[str, int] = {}
+		self._buckets: Dict[int, List[str]] = {}  # score -> event ids, sorted
+		self._levels: List[int] = []  # distinct scores, ascending
+		self.half_life = half_life
+		self.epoch: Optional[float] = None
+
+	def __len__(self) -> int:
+		return len(self._scores)
+
+	def _move(self, event_id: str, old: int, new: int) -> None:
+		if old > 0:
+			bucket = self._buckets[old]
+			del bucket[bisect_left(bucket, event_id)]
+			if not bucket:
+				del self._buckets[old]
+				del self._levels[bisect_left(self._levels, old)]
+		if new <= 0:
+			self._scores.pop(event_id, None)
+			return
+		target = self._buckets.get(new)
+		if target is None:
+			target = self._buckets[new] = []
+			insort(self._levels, new)
+		insort(target, event_id)
+		self._scores[event_id] = new
+
+	def stale(self, now: float) -> bool:
+		"""Whether the epoch has moved on since load(), so scores must be recounted."""
+		return self.epoch != decay_epoch(now, self.half_life)
+
+	def load(self, entries: Iterable[Tuple[str, Any]], now: float) -> None:
+		"""Start over from every (event_id, added_at) list entry."""
+		epoch = decay_epoch(now, self.half_life)
+		scores: Dict[str, int] = {}
+		for event_id, added_at in entries:
+			scores[event_id] = scores.get(event_id, 0) + popularity_weight(added_at, self.half_life, epoch)
+		buckets: Dict[int, List[str]] = {}
+		for event_id, score in scores.items():
+			if score > 0:
+				buckets.setdefault(score, []).append(event_id)
+		for bucket in buckets.values():
+			bucket.sort()
+		with self._lock:
+			self.epoch = epoch
+			self._scores = {event_id: score for event_id, score in scores.items() if score > 0}
+			self._buckets = buckets
+			self._levels = sorted(buckets)
+
+	def add(self, event_id: str, added_at: Any) -> None:
+		with self._lock:
+			old = self._scores.get(event_id, 0)
+			self._move(event_id, old, old + popularity_weight(added_at, self.half_life, self.epoch or 0.0))
+
+	def remove(self, event_id: str, added_at: Any) -> None:
+		"""Take back the entry add(event_id, added_at) counted."""
+		with self._lock:
+			old = self._scores.get(event_id, 0)
+			if old:
+				weight = popularity_weight(added_at, self.half_life, self.epoch or 0.0)
+				self._move(event_id, old, max(0, old - weight))
+
+	def score(self, event_id: str) -> int:
+		with self._lock:
+			return self._scores.get(event_id, 0)
+
+	def top(self, k: int) -> List[Tuple[str, int]]:
+		"""Up to k (event_id, score) pairs, highest score first."""
+		result: List[Tuple[str, int]] = []
+		with self._lock:
+			for level in reversed(self._levels):
+				if len(result) >= k:
+					break
+				result.extend((event_id, level) for event_id in self._buckets[level][:k - len(result)])
+		return result
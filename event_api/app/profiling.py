@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import cProfile
+import functools
+import hmac
+import io
+import pstats
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+
+# Request header carrying PROFILE_TOKEN to ask for a profile of the request.
+PROFILE_HEADER = b"x-profile"
+# Functions listed in a profile report.
+PROFILE_TOP_FUNCTIONS = 40
+
+# Set only while a profiled request is being handled.
+_stages: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("profile_stages", default=None)
+_profiler: ContextVar[Optional[cProfile.Profile]] = ContextVar("profiler", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+	"""Time the block as a named stage of a profiled request; free otherwise."""
+	stages = _stages.get()
+	if stages is None:
+		yield
+		return
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		stages.append((name, time.perf_counter() - start))
+
+
+def _profiled(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+	@functools.wraps(endpoint)
+	def run(*args: Any, **kwargs: Any) -> Any:
+		profiler = _profiler.get()
+		if profiler is None:
+			return endpoint(*args, **kwargs)
+		with stage("endpoint"):
+			profiler.enable()
+			try:
+				return endpoint(*args, **kwargs)
+			finally:
+				profiler.disable()
+
+	return run
+
+
+class ProfiledRoute(APIRoute):
+	"""APIRoute whose (sync) endpoint runs under the request's profiler, if any.
+
+	cProfile only sees the thread it is enabled on, and sync endpoints run in
+	the threadpool, so the profiler is switched on inside the endpoint call.
+	"""
+
+	def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+		super().__init__(path, _profiled(endpoint), **kwargs)
+
+
+def _server_timing(stages: List[Tuple[str, float]], total: float) -> str:
+	entries = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in stages]
+	entries.append(f"total;dur={total * 1000:.3f}")
+	return ", ".join(entries)
+
+
+def _report(status: int, total: float, stages: List[Tuple[str, float]], profiler: cProfile.Profile) -> bytes:
+	out = io.StringIO()
+	out.write(f"status: {status}\ntotal: {total * 1000:.3f} ms\n\nstages:\n")
+	for name, seconds in stages:
+		out.write(f"  {name:<12} {seconds * 1000:10.3f} ms\n")
+	out.write(f"\nendpoint profile (top {PROFILE_TOP_FUNCTIONS} by cumulative time):\n")
+	try:
+		pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+	except TypeError:  # nothing was recorded (no endpoint ran)
+		out.write("  (empty)\n")
+	return out.getvalue().encode()
+
+
+class ProfilingMiddleware:
+	"""ASGI middleware answering requests that carry the profile token with a report.
+
+	A request with "X-Profile: <token>" is handled as usual, but the response
+	is replaced by a plain-text breakdown: stage timings and a cProfile of the
+	endpoint. The original status is in X-Profile-Status and the stages are
+	also sent as a Server-Timing header. Other requests pass straight through.
+	"""
+
+	def __init__(self, app: Any, token: str) -> None:
+		self.app = app
+		self._token = token.encode()
+
+	def _requested(self, scope: Dict[str, Any]) -> bool:
+		for name, value in scope.get("headers", ()):
+			if name == PROFILE_HEADER:
+				return hmac.compare_digest(value, self._token)
+		return False
+
+	async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+		if scope["type"] != "http" or not self._requested(scope):
+			await self.app(scope, receive, send)
+			return
+		profiler = cProfile.Profile()
+		stages: List[Tuple[str, float]] = []
+		profiler_token = _profiler.set(profiler)
+		stages_token = _stages.set(stages)
+		status = 500
+		start = time.perf_counter()
+
+		async def discard(message: Dict[str, Any]) -> None:
+			nonlocal status
+			if message["type"] == "http.response.start":
+				status = message["status"]
+
+		try:
+			await self.app(scope, receive, discard)
+		finally:
+			_profiler.reset(profiler_token)
+			_stages.reset(stages_token)
+		total = time.perf_counter() - start
+		body = _report(status, total, stages, profiler)
+		headers = [
+			(b"content-type", b"text/plain; charset=utf-8"),
+			(b"content-length", str(len(body)).encode()),
+			(b"cache-control", b"no-store"),
+			(b"server-timing", _server_timing(stages, total).encode()),
+			(b"x-profile-status", str(status).encode()),
+		]
+		await send({"type": "http.response.start", "status": 200, "headers": headers})
+		await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# A projection is the ordered tuple of top-level keys an event is reduced to;
+# None means the full event.
+Projection = Optional[Tuple[str, ...]]
+
+
+def _first_session_platform(event: Dict[str, Any]) -> Any:
+	sessions = event.get("sessions")
+	if isinstance(sessions, list) and sessions and isinstance(sessions[0], dict):
+		return sessions[0].get("platform")
+	return None
+
+
+# Keys computed from the event rather than copied from it.
+DERIVED_FIELDS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+	"platform": _first_session_platform,
+}
+
+VIEWS: Dict[str, Tuple[str, ...]] = {
+	# What list screens show: title, category, image and when/where it starts.
+	"card": (
+		"event_id",
+		"title",
+		"category",
+		"ticket_type",
+		"start_timestamp",
+		"start_datetime_iso",
+		"end_timestamp",
+		"platform",
+		"image_url",
+		"thumbnail_url",
+	),
+}
+
+MAX_FIELDS = 32
+
+
+def parse_projection(fields: Optional[str] = None, view: Optional[str] = None) -> Projection:
+	"""Projection for a fields=a,b,c list or a named view (fields wins).
+
+	event_id is always included so clients can key the items; the remaining
+	names are de-duplicated and sorted so equivalent requests share one
+	projection.
+	"""
+	if fields:
+		names = {name.strip() for name in fields.split(",") if name.strip()}
+		names.discard("event_id")
+		if len(names) > MAX_FIELDS:
+			raise ValueError(f"at most {MAX_FIELDS} fields can be selected")
+		return ("event_id", *sorted(names))
+	if view:
+		if view not in VIEWS:
+			raise ValueError(f"unknown view '{view}'")
+		return VIEWS[view]
+	return None
+
+
+def project(event: Dict[str, Any], projection: Projection) -> Dict[str, Any]:
+	"""The keys of event named by projection, in projection order; missing keys are left out."""
+	if projection is None:
+		return event
+	result: Dict[str, Any] = {}
+	for name in projection:
+		if name in event:
+			result[name] = event[name]
+		elif name in DERIVED_FIELDS:
+			value = DERIVED_FIELDS[name](event)
+			if value is not None:
+				result[name] = value
+	return result
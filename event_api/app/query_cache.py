@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+
+
+class QueryResultCache:
+	"""Bounded LRU of fully ordered result index lists for one snapshot generation.
+
+	Entries remember the generation they were computed from; the first lookup
+	against a newer generation drops them all. Cached lists are shared between
+	callers and must not be mutated.
+	"""
+
+	def __init__(self, max_entries: int) -> None:
+		self._max_entries = max_entries
+		self._lock = threading.Lock()
+		self._entries: OrderedDict[Hashable, List[int]] = OrderedDict()
+		self._generation = 0
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.invalidations = 0
+
+	def _sync_generation(self, generation: int) -> None:
+		if generation != self._generation:
+			if self._entries:
+				self.invalidations += 1
+			self._entries.clear()
+			self._generation = generation
+
+	def get(self, generation: int, key: Hashable) -> Optional[List[int]]:
+		with self._lock:
+			self._sync_generation(generation)
+			result = self._entries.get(key)
+			if result is None:
+				self.misses += 1
+				return None
+			self._entries.move_to_end(key)
+			self.hits += 1
+			return result
+
+	def put(self, generation: int, key: Hashable, result: List[int]) -> None:
+		if self._max_entries <= 0:
+			return
+		with self._lock:
+			self._sync_generation(generation)
+			self._entries[key] = result
+			self._entries.move_to_end(key)
+			while len(self._entries) > self._max_entries:
+				self._entries.popitem(last=False)
+				self.evictions += 1
+
+	def stats(self) -> Dict[str, int]:
+		with self._lock:
+			return {
+				"entries": len(self._entries),
+				"max_entries": self._max_entries,
+				"hits": self.hits,
+				"misses": self.misses,
+				"evictions": self.evictions,
+				"invalidations": self.invalidations,
+			}
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import gzip
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+try:
+	import brotli  # type: ignore[import]
+except ImportError:  # brotli is optional: without it only gzip is offered
+	brotli = None  # type: ignore[assignment]
+
+from .config import COMPRESS_MIN_BYTES, RESPONSE_CACHE_BYTES
+
+# Content codings we can produce, most preferred first.
+ENCODINGS: Tuple[str, ...] = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compress(body: bytes, encoding: str, fast: bool = False) -> bytes:
+	"""body in the given content coding. Cached bodies are compressed once per
+	data generation, so by default this favours ratio over speed; fast is for
+	bodies compressed again on every request."""
+	if encoding == "br":
+		return brotli.compress(body, quality=1 if fast else 9)
+	return gzip.compress(body, compresslevel=1 if fast else 9, mtime=0)
+
+
+class ResponseCache:
+	"""Bounded LRU of rendered response bodies, per content coding.
+
+	Keys are (ETag, coding), and an ETag already names the data version and the
+	request, so an entry stays valid until the events data changes; entries of
+	an older source_hash are dropped on the first access after it does.
+	"""
+
+	def __init__(self, max_bytes: Optional[int] = None, min_compress_bytes: Optional[int] = None) -> None:
+		self._max_bytes = max_bytes if max_bytes is not None else RESPONSE_CACHE_BYTES
+		self._min_compress_bytes = min_compress_bytes if min_compress_bytes is not None else COMPRESS_MIN_BYTES
+		self._lock = threading.Lock()
+		self._entries: OrderedDict[Tuple[str, str], Tuple[bytes, Dict[str, str]]] = OrderedDict()
+		self._used = 0
+		self._source_hash = ""
+		self.hits = 0
+		self.misses = 0
+
+	def _sync(self, source_hash: str) -> None:
+		if source_hash != self._source_hash:
+			self._entries.clear()
+			self._used = 0
+			self._source_hash = source_hash
+
+	def get(self, source_hash: str, etag: str, encoding: str) -> Optional[Tuple[bytes, Dict[str, str]]]:
+		with self._lock:
+			self._sync(source_hash)
+			entry = self._entries.get((etag, encoding))
+			if entry is None:
+				self.misses += 1
+				return None
+			self._entries.move_to_end((etag, encoding))
+			self.hits += 1
+			return entry
+
+	def cacheable(self, size: int) -> bool:
+		"""Whether put() keeps a body of size bytes (at most an eighth of the budget)."""
+		return size <= self._max_bytes // 8
+
+	def put(self, source_hash: str, etag: str, encoding: str, body: bytes, headers: Dict[str, str]) -> None:
+		if not self.cacheable(len(body)):
+			return
+		with self._lock:
+			self._sync(source_hash)
+			old = self._entries.pop((etag, encoding), None)
+			if old is not None:
+				self._used -= len(old[0])
+			self._entries[(etag, encoding)] = (body, headers)
+			self._used += len(body)
+			while self._used > self._max_bytes:
+				_, (evicted, _) = self._entries.popitem(last=False)
+				self._used -= len(evicted)
+
+	def encode(self, body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+		"""(body, coding actually applied); small bodies are left uncompressed.
+
+		Bodies too big to be cached even uncompressed would be compressed on
+		every request, so they get the fast level instead.
+		"""
+		if encoding is None or len(body) < self._min_compress_bytes:
+			return body, None
+		return compress(body, encoding, fast=not self.cacheable(len(body))), encoding
+
+	def stats(self) -> Dict[str, int]:
+		with self._lock:
+			return {"entries": len(self._entries), "bytes": self._used, "hits": self.hits, "misses": self.misses}
+
+
+response_cache = ResponseCache()
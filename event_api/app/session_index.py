@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from typing import List, Optional, Sequence
+
+
+class SessionIntervalIndex:
+	"""Static index answering "which sessions overlap [start_min, end_max]".
+
+	Sessions are ordered by start timestamp, so the sessions starting no later
+	than end_max form a prefix found by binary search. A segment tree over that
+	order keeps the min/max end timestamp of every node: subtrees ending before
+	start_min are pruned and subtrees that all qualify are emitted as one slice,
+	giving O(log n + k) per query.
+	"""
+
+	def __init__(self, starts: Sequence[int], ends: Sequence[int]) -> None:
+		self._order: List[int] = sorted(range(len(starts)), key=starts.__getitem__)
+		self._starts: List[int] = [starts[i] for i in self._order]
+		size = 1
+		while size < len(self._order):
+			size *= 2
+		self._size = size
+		self._max_end: List[float] = [float("-inf")] * (2 * size)
+		self._min_end: List[float] = [float("inf")] * (2 * size)
+		for pos, session_id in enumerate(self._order):
+			self._max_end[size + pos] = self._min_end[size + pos] = ends[session_id]
+		for node in range(size - 1, 0, -1):
+			left, right = 2 * node, 2 * node + 1
+			self._max_end[node] = max(self._max_end[left], self._max_end[right])
+			self._min_end[node] = min(self._min_end[left], self._min_end[right])
+
+	def __len__(self) -> int:
+		return len(self._order)
+
+	def query(self, start_min: Optional[int] = None, end_max: Optional[int] = None) -> List[int]:
+		"""Session ids with end >= start_min and start <= end_max, by start time.
+
+		A bound of None leaves that side open.
+		"""
+		stop = len(self._order) if end_max is None else bisect_right(self._starts, end_max)
+		if stop == 0:
+			return []
+		if start_min is None:
+			return self._order[:stop]
+
+		result: List[int] = []
+		stack = [(1, 0, self._size)]
+		while stack:
+			node, lo, hi = stack.pop()
+			if lo >= stop or self._max_end[node] < start_min:
+				continue
+			if hi <= stop and self._min_end[node] >= start_min:
+				result.extend(self._order[lo:hi])
+				continue
+			mid = (lo + hi) // 2
+			stack.append((2 * node + 1, mid, hi))
+			stack.append((2 * node, lo, mid))
+		return result
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import glob
+import mmap
+import os
+import pickle
+from typing import Callable, Optional, TYPE_CHECKING
+
+from .file_lock import exclusive_lock
+
+if TYPE_CHECKING:
+	from .data_loader import EventsSnapshot
+
+
+# Bumped whenever EventsSnapshot gains or changes attributes, so snapshots
+# pickled by an older version of the code are rebuilt rather than loaded.
+SNAPSHOT_FORMAT = 7
+
+
+class SharedSnapshotCache:
+	"""Built EventsSnapshots shared between worker processes through files.
+
+	The first worker to see a given events.json content builds the snapshot and
+	writes it to cache_dir under a cross-process lock; every other worker maps
+	that file and unpickles it instead of parsing and re-indexing the source.
+	Each process still materializes its own Python objects.
+	"""
+
+	def __init__(self, cache_dir: str) -> None:
+		self._cache_dir = cache_dir
+
+	def _path(self, source_hash: str) -> str:
+		return os.path.join(self._cache_dir, f"events-{source_hash}.v{SNAPSHOT_FORMAT}.snapshot")
+
+	@staticmethod
+	def _read(path: str) -> Optional[EventsSnapshot]:
+		try:
+			with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+				return pickle.loads(m)
+		except (OSError, ValueError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+			return None
+
+	def _write(self, path: str, snap: EventsSnapshot) -> None:
+		tmp_path = f"{path}.{os.getpid()}.tmp"
+		with open(tmp_path, "wb") as f:
+			pickle.dump(snap, f, protocol=pickle.HIGHEST_PROTOCOL)
+		os.replace(tmp_path, path)
+		for stale in glob.glob(os.path.join(self._cache_dir, "events-*.snapshot")):
+			if stale != path:
+				try:
+					os.remove(stale)
+				except OSError:
+					pass
+
+	def load_or_build(self, source_hash: str, build: Callable[[], EventsSnapshot]) -> EventsSnapshot:
+		path = self._path(source_hash)
+		snap = self._read(path)
+		if snap is not None:
+			return snap
+		os.makedirs(self._cache_dir, exist_ok=True)
+		with exclusive_lock(os.path.join(self._cache_dir, "events.lock")):
+			snap = self._read(path)
+			if snap is not None:
+				return snap
+			snap = build()
+			self._write(path, snap)
+			return snap
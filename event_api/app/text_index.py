@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import math
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+# Latin/digit words, and runs of CJK (kana, ideographs, hangul) characters.
+_TOKEN = re.compile(r"[0-9a-z]+|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+")
+
+# How much a term found in each field counts towards an event's score.
+FIELD_WEIGHTS: Tuple[Tuple[str, float], ...] = (
+	("title", 4.0),
+	("organizer", 2.0),
+	("platform", 2.0),
+	("address", 1.0),
+	("event_description", 1.0),
+)
+
+# Vocabulary words a latin prefix may expand to; longer tails are dropped.
+MAX_PREFIX_EXPANSIONS = 64
+
+
+def normalize(text: str) -> str:
+	"""NFKC (full-width letters and digits become ASCII) and lowercase."""
+	return unicodedata.normalize("NFKC", text).lower()
+
+
+def _index_terms(text: str) -> Set[str]:
+	"""Terms a field is indexed under: latin words, CJK characters and CJK bigrams."""
+	terms: Set[str] = set()
+	for run in _TOKEN.findall(normalize(text)):
+		if run.isascii():
+			terms.add(run)
+			continue
+		terms.update(run)
+		terms.update(run[i:i + 2] for i in range(len(run) - 1))
+	return terms
+
+
+def _event_fields(event: Dict[str, Any]) -> List[Tuple[str, str]]:
+	fields = [(name, event.get(name)) for name in ("title", "organizer", "event_description")]
+	sessions = event.get("sessions")
+	if isinstance(sessions, list):
+		for session in sessions:
+			if isinstance(session, dict):
+				fields.append(("platform", session.get("platform")))
+				fields.append(("address", session.get("address")))
+	return [(name, value) for name, value in fields if isinstance(value, str) and value]
+
+
+def _term_weights(event: Dict[str, Any]) -> Dict[str, float]:
+	"""Summed FIELD_WEIGHTS of the fields each term occurs in.
+
+	A term counts once per field it occurs in, however often it repeats.
+	"""
+	fields_hit: Dict[str, Set[str]] = {}
+	for name, value in _event_fields(event):
+		for term in _index_terms(value):
+			fields_hit.setdefault(term, set()).add(name)
+	field_weight = dict(FIELD_WEIGHTS)
+	return {term: sum(field_weight[name] for name in names) for term, names in fields_hit.items()}
+
+
+class TextIndex:
+	"""Inverted index for keyword search over Traditional Chinese event text.
+
+	CJK text has no word boundaries, so it is indexed as overlapping character
+	bigrams (plus single characters, for one-character queries); latin words
+	are indexed whole and matched by prefix. An event matches when it contains
+	every query term, and is scored by the idf-weighted fields they occur in.
+
+	Given the index of a previous version of the events and old_index, where
+	old_index[i] is the previous index of event i if that event is unchanged
+	(else -1), only new and changed events are tokenized again; the postings of
+	the others are carried over with their indices remapped.
+	"""
+
+	def __init__(
+		self,
+		events: Sequence[Dict[str, Any]],
+		previous: Optional[TextIndex] = None,
+		old_index: Optional[Sequence[int]] = None,
+	) -> None:
+		self.size = len(events)
+		# term -> (event indices ascending, field weight per event); a match
+		# scores the field weight times the term's idf.
+		self.postings: Dict[str, Tuple[array, array]] = {}
+		weights: Dict[str, Dict[int, float]] = {}
+		fresh: Sequence[int] = range(self.size)
+		if previous is not None and old_index is not None:
+			new_index = array("q", [-1]) * previous.size
+			fresh = []
+			for idx, old in enumerate(old_index):
+				if old >= 0:
+					new_index[old] = idx
+				else:
+					fresh.append(idx)
+		for idx in fresh:
+			for term, weight in _term_weights(events[idx]).items():
+				weights.setdefault(term, {})[idx] = weight
+		if previous is not None and old_index is not None:
+			# Unchanged events usually keep their relative order, and then the
+			# remapped postings of terms no fresh event has are still ascending.
+			kept = [old for old in old_index if old >= 0]
+			in_order = all(a < b for a, b in zip(kept, kept[1:]))
+			dropped = len(kept) < previous.size
+			for term, (indices, term_weights) in previous.postings.items():
+				remapped = array("q", [new_index[i] for i in indices])
+				if in_order and term not in weights:
+					if not dropped or -1 not in remapped:
+						self.postings[term] = (remapped, term_weights)
+					elif remapped.count(-1) < len(remapped):
+						live = [pos for pos, idx in enumerate(remapped) if idx >= 0]
+						self.postings[term] = (
+							array("q", [remapped[pos] for pos in live]),
+							array("d", [term_weights[pos] for pos in live]),
+						)
+					continue
+				per_event = weights.setdefault(term, {})
+				for idx, weight in zip(remapped, term_weights):
+					if idx >= 0:
+						per_event[idx] = weight
+		for term, per_event in weights.items():
+			ordered: List[int] = sorted(per_event)
+			if ordered:
+				self.postings[term] = (array("q", ordered), array("d", [per_event[i] for i in ordered]))
+		total = max(self.size, 1)
+		self.idf: Dict[str, float] = {
+			term: math.log(1.0 + total / len(indices)) for term, (indices, _) in self.postings.items()
+		}
+		self.words: List[str] = sorted(term for term in self.postings if term.isascii())
+
+	def _expand(self, word: str) -> List[str]:
+		"""Indexed latin words starting with word."""
+		start = bisect_left(self.words, word)
+		matches: List[str] = []
+		for term in self.words[start:start + MAX_PREFIX_EXPANSIONS]:
+			if not term.startswith(word):
+				break
+			matches.append(term)
+		return matches
+
+	def _query_groups(self, query: str) -> List[List[str]]:
+		"""One group of alternative terms per query term; an event must hit each group."""
+		groups: List[List[str]] = []
+		for run in _TOKEN.findall(normalize(query)):
+			if run.isascii():
+				groups.append(self._expand(run))
+			elif len(run) == 1:
+				groups.append([run])
+			else:
+				groups.extend([run[i:i + 2]] for i in range(len(run) - 1))
+		return groups
+
+	def search(self, query: str) -> Dict[int, float]:
+		"""Score of every event matching all terms of query (empty if none or no terms)."""
+		groups = self._query_groups(query)
+		if not groups:
+			return {}
+		group_scores: List[Dict[int, float]] = []
+		for group in groups:
+			scores: Dict[int, float] = {}
+			for term in group:
+				posting = self.postings.get(term)
+				if posting is None:
+					continue
+				idf = self.idf[term]
+				for idx, weight in zip(*posting):
+					weight *= idf
+					if weight > scores.get(idx, 0.0):
+						scores[idx] = weight
+			if not scores:
+				return {}
+			group_scores.append(scores)
+		group_scores.sort(key=len)
+		result = dict(group_scores[0])
+		for scores in group_scores[1:]:
+			result = {idx: score + scores[idx] for idx, score in result.items() if idx in scores}
+			if not result:
+				break
+		return result
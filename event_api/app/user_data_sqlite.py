@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+from .config import HOT_HALF_LIFE_HOURS, USERDATA_JSON_PATH, USERDATA_SQLITE_PATH
+from .journal import AppendOnlyJournal
+from .metrics import USERDATA_SAVE_SECONDS
+from .popularity import decay_epoch, popularity_weight
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_events (
+	id INTEGER PRIMARY KEY,
+	uid TEXT NOT NULL,
+	list TEXT NOT NULL CHECK (list IN ('passport', 'favourite')),
+	event_id TEXT NOT NULL,
+	added_at INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS user_events_uid_list_event ON user_events (uid, list, event_id);
+CREATE INDEX IF NOT EXISTS user_events_uid_list_id ON user_events (uid, list, id);
+CREATE TABLE IF NOT EXISTS event_popularity (
+	event_id TEXT PRIMARY KEY,
+	score INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS event_popularity_rank ON event_popularity (score DESC, event_id);
+CREATE TABLE IF NOT EXISTS meta (
+	key TEXT PRIMARY KEY,
+	value TEXT NOT NULL
+);
+"""
+
+# Weight of a user_events row in event_popularity, at the epoch scores are relative to.
+_WEIGHT = "popularity_weight(?, (SELECT CAST(value AS REAL) FROM meta WHERE key = 'popularity_epoch'))"
+
+
+class SqliteUserDataStore:
+	"""SQLite (WAL mode) user data store with the same API as UserDataStore.
+
+	Each thread gets its own connection; list order is insertion order. On
+	first use the existing userdata.json (plus its journal) is imported once.
+	Several worker processes can share one database file.
+
+	event_popularity holds each event's popularity score (see
+	PopularityCounter), updated in the same transaction as the list, so every
+	worker ranks top_events() the same way, and the same as the json backend.
+	"""
+
+	def __init__(
+		self,
+		db_path: Optional[str] = None,
+		json_path: Optional[str] = None,
+		popularity_half_life: Optional[float] = None,
+	) -> None:
+		self._db_path: str = db_path or USERDATA_SQLITE_PATH
+		self._half_life: float = (
+			popularity_half_life if popularity_half_life is not None else HOT_HALF_LIFE_HOURS * 3600
+		)
+		self._local = threading.local()
+		self._connections: List[sqlite3.Connection] = []
+		self._connections_lock = threading.Lock()
+		os.makedirs(os.path.dirname(self._db_path) or ".", exist_ok=True)
+		conn = self._conn()
+		with conn:
+			conn.executescript(_SCHEMA)
+		self._recount_popularity(conn, time.time())
+		self.migrate_from_json(json_path or USERDATA_JSON_PATH)
+
+	def _conn(self) -> sqlite3.Connection:
+		conn = getattr(self._local, "conn", None)
+		if conn is None:
+			conn = sqlite3.connect(self._db_path, timeout=30.0, check_same_thread=False)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			half_life = self._half_life
+			conn.create_function(
+				"popularity_weight",
+				2,
+				lambda added_at, epoch: popularity_weight(added_at, half_life, epoch),
+				deterministic=True,
+			)
+			self._local.conn = conn
+			with self._connections_lock:
+				self._connections.append(conn)
+		return conn
+
+	def _recount_popularity(self, conn: sqlite3.Connection, now: float) -> None:
+		"""Recount event_popularity when the half-life or decay epoch changed; one worker does it."""
+		epoch = decay_epoch(now, self._half_life)
+		basis = f"{self._half_life!r}@{epoch!r}"
+		row = conn.execute("SELECT value FROM meta WHERE key = 'popularity_basis'").fetchone()
+		if row is not None and row[0] == basis:
+			return
+		with conn:
+			claimed = conn.execute(
+				"INSERT INTO meta (key, value) VALUES ('popularity_basis', ?) "
+				"ON CONFLICT (key) DO UPDATE SET value = excluded.value WHERE value != excluded.value",
+				(basis,),
+			).rowcount
+			if claimed:
+				conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('popularity_epoch', ?)", (repr(epoch),))
+				conn.execute("DELETE FROM event_popularity")
+				conn.execute(
+					"INSERT INTO event_popularity (event_id, score) "
+					"SELECT event_id, SUM(popularity_weight(added_at, ?)) FROM user_events GROUP BY event_id",
+					(epoch,),
+				)
+
+	def migrate_from_json(self, json_path: str) -> bool:
+		"""Import userdata.json and its journal once; return True if it ran."""
+		conn = self._conn()
+		with conn:
+			# Claiming the marker row takes the write lock, so when several workers
+			# start together exactly one imports and the rest wait, then skip.
+			claimed = conn.execute(
+				"INSERT OR IGNORE INTO meta (key, value) VALUES ('migrated_from_json', ?)", (json_path,)
+			).rowcount
+			if not claimed:
+				return False
+			users: Dict[str, Any] = {}
+			try:
+				with open(json_path, "rb") as f:
+					data = orjson.loads(f.read())
+				if isinstance(data, dict) and isinstance(data.get("users"), dict):
+					users = data["users"]
+			except (FileNotFoundError, ValueError):
+				pass
+			for uid, user in users.items():
+				for list_name in ("passport", "favourite"):
+					for item in user.get(list_name) or []:
+						self._insert(conn, uid, list_name, item["event_id"], int(item.get("added_at") or 0))
+			for record in AppendOnlyJournal.replay(json_path + ".journal"):
+				self._apply_record(conn, record)
+		return True
+
+	@classmethod
+	def _apply_record(cls, conn: sqlite3.Connection, record: Dict[str, Any]) -> None:
+		"""Replay one userdata.json journal record; malformed records are skipped."""
+		uid, list_name, event_id = record.get("uid"), record.get("list"), record.get("event_id")
+		if not uid or list_name not in ("passport", "favourite") or not event_id:
+			return
+		if record.get("op") == "add":
+			cls._insert(conn, uid, list_name, event_id, int(record.get("added_at") or 0))
+		elif record.get("op") == "remove":
+			cls._delete(conn, uid, list_name, event_id)
+
+	@staticmethod
+	def _insert(conn: sqlite3.Connection, uid: str, list_name: str, event_id: str, added_at: int) -> bool:
+		cur = conn.execute(
+			"INSERT OR IGNORE INTO user_events (uid, list, event_id, added_at) VALUES (?, ?, ?, ?)",
+			(uid, list_name, event_id, added_at),
+		)
+		if cur.rowcount <= 0:
+			return False
+		conn.execute(
+			f"INSERT INTO event_popularity (event_id, score) VALUES (?, {_WEIGHT}) "
+			"ON CONFLICT (event_id) DO UPDATE SET score = score + excluded.score",
+			(event_id, added_at),
+		)
+		return True
+
+	@staticmethod
+	def _delete(conn: sqlite3.Connection, uid: str, list_name: str, event_id: str) -> bool:
+		row = conn.execute(
+			"SELECT id, added_at FROM user_events WHERE uid = ? AND list = ? AND event_id = ?",
+			(uid, list_name, event_id),
+		).fetchone()
+		if row is None or conn.execute("DELETE FROM user_events WHERE id = ?", (row[0],)).rowcount <= 0:
+			return False
+		conn.execute(f"UPDATE event_popularity SET score = score - {_WEIGHT} WHERE event_id = ?", (row[1], event_id))
+		conn.execute("DELETE FROM event_popularity WHERE event_id = ? AND score <= 0", (event_id,))
+		return True
+
+	def _list(self, uid: str, list_name: str) -> List[Dict[str, Any]]:
+		rows = self._conn().execute(
+			"SELECT event_id, added_at FROM user_events WHERE uid = ? AND list = ? ORDER BY id",
+			(uid, list_name),
+		).fetchall()
+		return [{"event_id": event_id, "added_at": added_at} for event_id, added_at in rows]
+
+	def _add(self, uid: str, list_name: str, event_id: str) -> Tuple[bool, Dict[str, Any]]:
+		conn = self._conn()
+		added_at = int(time.time())
+		if self._half_life > 0:
+			self._recount_popularity(conn, added_at)
+		with USERDATA_SAVE_SECONDS.time("sqlite"), conn:
+			if self._insert(conn, uid, list_name, event_id, added_at):
+				return True, {"event_id": event_id, "added_at": added_at}
+			row = conn.execute(
+				"SELECT added_at FROM user_events WHERE uid = ? AND list = ? AND event_id = ?",
+				(uid, list_name, event_id),
+			).fetchone()
+		return False, {"event_id": event_id, "added_at": row[0] if row else added_at}
+
+	def _remove(self, uid: str, list_name: str, event_id: str) -> bool:
+		conn = self._conn()
+		if self._half_life > 0:
+			self._recount_popularity(conn, time.time())
+		with USERDATA_SAVE_SECONDS.time("sqlite"), conn:
+			return self._delete(conn, uid, list_name, event_id)
+
+	def get_user_profile(self, uid: str) -> Dict[str, Any]:
+		return {"uid": uid, "passport": self._list(uid, "passport"), "favourite": self._list(uid, "favourite")}
+
+	def get_passport(self, uid: str) -> List[Dict[str, Any]]:
+		return self._list(uid, "passport")
+
+	def get_favourite(self, uid: str) -> List[Dict[str, Any]]:
+		return self._list(uid, "favourite")
+
+	def add_to_passport(self, uid: str, event_id: str) -> Dict[str, Any]:
+		added, entry = self._add(uid, "passport", event_id)
+		if not added:
+			return {"added": False, "message": "Event already in passport", "event": entry}
+		return {"added": True, "message": "Event added to passport", "event": entry}
+
+	def add_to_favourite(self, uid: str, event_id: str) -> Dict[str, Any]:
+		added, entry = self._add(uid, "favourite", event_id)
+		if not added:
+			return {"added": False, "message": "Event already in favourites", "event": entry}
+		return {"added": True, "message": "Event added to favourites", "event": entry}
+
+	def remove_from_passport(self, uid: str, event_id: str) -> Dict[str, Any]:
+		if self._remove(uid, "passport", event_id):
+			return {"removed": True, "message": "Event removed from passport"}
+		return {"removed": False, "message": "Event not found in passport"}
+
+	def remove_from_favourite(self, uid: str, event_id: str) -> Dict[str, Any]:
+		if self._remove(uid, "favourite", event_id):
+			return {"removed": True, "message": "Event removed from favourites"}
+		return {"removed": False, "message": "Event not found in favourites"}
+
+	def top_events(self, k: int) -> List[Tuple[str, int]]:
+		"""Up to k (event_id, popularity) pairs, most passported/favourited first."""
+		conn = self._conn()
+		if self._half_life > 0:
+			self._recount_popularity(conn, time.time())
+		rows = conn.execute(
+			"SELECT event_id, score FROM event_popularity WHERE score > 0 ORDER BY score DESC, event_id LIMIT ?",
+			(max(k, 0),),
+		).fetchall()
+		return [(event_id, score) for event_id, score in rows]
+
+	def validate_event_exists(self, event_id: str, events_store) -> bool:
+		return events_store.has_event(event_id)
+
+	def close(self) -> None:
+		with self._connections_lock:
+			for conn in self._connections:
+				conn.close()
+			self._connections.clear()
+		self._local = threading.local()
@@ -3,107 +3,327 @@ from __future__ import annotations
 import os
 import threading
 import time
-from typing import Any, Dict, List, Optional
+from contextlib import contextmanager
+from typing import IO, TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple, Union
 
 import orjson
 
-from .config import USERDATA_JSON_PATH
+from .config import HOT_HALF_LIFE_HOURS, USERDATA_BACKEND, USERDATA_COMPACT_EVERY, USERDATA_JSON_PATH
+from .file_lock import try_exclusive_lock
+from .journal import AppendOnlyJournal
+from .metrics import USERDATA_LOCK_WAIT_SECONDS, USERDATA_SAVE_SECONDS
+from .popularity import PopularityCounter
+
+if TYPE_CHECKING:
+	from .user_data_sqlite import SqliteUserDataStore
+
+
+# Number of locks user ids are hashed onto; unrelated users rarely share one.
+USER_LOCK_STRIPES = 64
+
+_LIST_NAMES = ("passport", "favourite")
 
 
 class UserDataStore:
-	"""Thread-safe user data store for passport and favourite events."""
-	
-	def __init__(self, json_path: Optional[str] = None) -> None:
+	"""Thread-safe user data store for passport and favourite events.
+
+	userdata.json holds a snapshot; every mutation after it is appended to
+	userdata.json.journal (group-committed, one fsync per batch of concurrent
+	writers) and replayed on start. Once the journal holds
+	USERDATA_COMPACT_EVERY records it is folded into a fresh snapshot on a
+	background thread.
+
+	Users are guarded by striped locks keyed on uid, and each passport or
+	favourite list is kept in memory as an insertion-ordered dict keyed by
+	event_id, so membership, add and remove are O(1). Event popularity for the
+	trending top_events() is derived from the entries' added_at and kept up to
+	date as they change (see PopularityCounter).
+
+	The files are owned by a single process: a second process opening the same
+	userdata.json fails instead of silently overwriting the first one's writes.
+	Multi-worker deployments use the sqlite backend.
+	"""
+
+	def __init__(
+		self,
+		json_path: Optional[str] = None,
+		compact_every: Optional[int] = None,
+		popularity_half_life: Optional[float] = None,
+	) -> None:
 		self._json_path: str = json_path or USERDATA_JSON_PATH
-		self._lock = threading.Lock()
-		self._data: Dict[str, Dict[str, Any]] = {"users": {}}
+		self._compact_every: int = compact_every if compact_every is not None else USERDATA_COMPACT_EVERY
+		self._locks = [threading.Lock() for _ in range(USER_LOCK_STRIPES)]
+		self._compact_lock = threading.Lock()
+		self._users: Dict[str, Dict[str, Any]] = {}
+		owner_lock = try_exclusive_lock(self._json_path + ".lock")
+		if owner_lock is None:
+			raise RuntimeError(
+				f"{self._json_path} is already in use by another process; "
+				"set USERDATA_BACKEND=sqlite to run multiple workers"
+			)
+		self._owner_lock: IO[bytes] = owner_lock
 		self._ensure_file_exists()
 		self._load_file()
-	
+		self._journal = AppendOnlyJournal(self._json_path + ".journal")
+		self._replay_journal()
+		self._popularity = PopularityCounter(
+			popularity_half_life if popularity_half_life is not None else HOT_HALF_LIFE_HOURS * 3600
+		)
+		self._popularity.load(self._entries(), time.time())
+
+	def _lock_for(self, uid: str) -> threading.Lock:
+		return self._locks[hash(uid) % USER_LOCK_STRIPES]
+
+	@contextmanager
+	def _locked(self, uid: str) -> Iterator[None]:
+		"""Hold uid's stripe lock, recording how long it took to get when it was contended.
+
+		Uncontended acquisitions are not observed, so the common path never
+		touches the histogram's (global) lock.
+		"""
+		lock = self._lock_for(uid)
+		if not lock.acquire(blocking=False):
+			start = time.perf_counter()
+			lock.acquire()
+			USERDATA_LOCK_WAIT_SECONDS.observe(time.perf_counter() - start, "user")
+		try:
+			yield
+		finally:
+			lock.release()
+
 	def _ensure_file_exists(self) -> None:
 		if not os.path.exists(self._json_path):
 			os.makedirs(os.path.dirname(self._json_path), exist_ok=True)
 			with open(self._json_path, "wb") as f:
 				f.write(orjson.dumps({"users": {}}, option=orjson.OPT_INDENT_2))
-	
+
 	def _load_file(self) -> None:
 		try:
 			with open(self._json_path, "rb") as f:
 				data = orjson.loads(f.read())
 			if not isinstance(data, dict) or "users" not in data:
 				raise ValueError("Invalid userdata.json format")
-			self._data = data
 		except (FileNotFoundError, ValueError):
-			self._data = {"users": {}}
-			self._save_file()
-	
-	def _save_file(self) -> None:
-		with open(self._json_path, "wb") as f:
-			f.write(orjson.dumps(self._data, option=orjson.OPT_INDENT_2))
-	
+			self._users = {}
+			self._save_file(self._dump())
+			return
+		self._users = {}
+		for uid, user in data["users"].items():
+			user = dict(user)
+			for list_name in _LIST_NAMES:
+				items: Dict[str, Dict[str, Any]] = {}
+				for item in user.get(list_name) or []:
+					items.setdefault(item["event_id"], item)
+				user[list_name] = items
+			self._users[uid] = user
+
+	def _dump(self) -> bytes:
+		users = {
+			uid: {**user, **{list_name: list(user[list_name].values()) for list_name in _LIST_NAMES}}
+			for uid, user in self._users.items()
+		}
+		return orjson.dumps({"users": users}, option=orjson.OPT_INDENT_2)
+
+	def _save_file(self, body: bytes) -> None:
+		tmp_path = self._json_path + ".tmp"
+		with USERDATA_SAVE_SECONDS.time("snapshot"):
+			with open(tmp_path, "wb") as f:
+				f.write(body)
+				f.flush()
+				os.fsync(f.fileno())
+			os.replace(tmp_path, self._json_path)
+
+	def _replay_journal(self) -> None:
+		for record in AppendOnlyJournal.replay(self._journal.path):
+			uid, list_name, event_id = record.get("uid"), record.get("list"), record.get("event_id")
+			if not uid or list_name not in _LIST_NAMES or not event_id:
+				continue
+			if record.get("op") == "add":
+				self._apply_add(uid, list_name, {"event_id": event_id, "added_at": record.get("added_at")})
+			elif record.get("op") == "remove":
+				self._apply_remove(uid, list_name, event_id)
+		if os.path.getsize(self._journal.path):
+			self._compact()
+
+	def _entries(self) -> Iterator[Tuple[str, Any]]:
+		"""(event_id, added_at) of every passport and favourite entry."""
+		for user in self._users.values():
+			for list_name in _LIST_NAMES:
+				for event_id, entry in user[list_name].items():
+					yield event_id, entry.get("added_at")
+
+	def _recount_popularity(self) -> None:
+		"""Recount popularity for a new decay epoch, with every stripe lock held."""
+		for lock in self._locks:
+			lock.acquire()
+		try:
+			now = time.time()
+			if self._popularity.stale(now):
+				self._popularity.load(self._entries(), now)
+		finally:
+			for lock in reversed(self._locks):
+				lock.release()
+
+	def _compact(self) -> None:
+		"""Fold the journal into a new userdata.json snapshot.
+
+		Takes every stripe lock (in a fixed order), so callers must not hold one.
+		"""
+		with self._compact_lock:
+			self._compact_locked()
+
+	def _compact_locked(self) -> None:
+		# The stripe locks are held only to serialize a consistent snapshot and
+		# mark the journal; writing it out and trimming the journal run without
+		# them, and records appended meanwhile stay in the journal.
+		start = time.perf_counter()
+		for lock in self._locks:
+			lock.acquire()
+		USERDATA_LOCK_WAIT_SECONDS.observe(time.perf_counter() - start, "compaction")
+		try:
+			body = self._dump()
+			upto = self._journal.mark()
+		finally:
+			for lock in reversed(self._locks):
+				lock.release()
+		self._save_file(body)
+		self._journal.truncate(upto)
+
+	def _compact_in_background(self) -> None:
+		try:
+			if len(self._journal) >= self._compact_every:
+				self._compact_locked()
+		except OSError as exc:
+			print(f"[userdata] compaction failed, journal kept: {exc}")
+		finally:
+			self._compact_lock.release()
+
+	def _maybe_compact(self) -> None:
+		if self._compact_every <= 0 or len(self._journal) < self._compact_every:
+			return
+		# Whoever crosses the threshold first starts a background compaction; the rest carry on.
+		if not self._compact_lock.acquire(blocking=False):
+			return
+		try:
+			threading.Thread(target=self._compact_in_background, name="userdata-compact", daemon=True).start()
+		except BaseException:
+			self._compact_lock.release()
+			raise
+
 	def _get_user(self, uid: str) -> Dict[str, Any]:
-		if uid not in self._data["users"]:
-			self._data["users"][uid] = {"passport": [], "favourite": []}
-		return self._data["users"][uid]
-	
+		user = self._users.get(uid)
+		if user is None:
+			user = self._users.setdefault(uid, {"passport": {}, "favourite": {}})
+		return user
+
+	def _peek_list(self, uid: str, list_name: str) -> List[Dict[str, Any]]:
+		user = self._users.get(uid)
+		return list(user[list_name].values()) if user else []
+
+	def _apply_add(self, uid: str, list_name: str, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+		"""Add entry unless present; return the existing entry if it was."""
+		items = self._get_user(uid)[list_name]
+		existing = items.get(entry["event_id"])
+		if existing is not None:
+			return existing
+		items[entry["event_id"]] = entry
+		return None
+
+	def _apply_remove(self, uid: str, list_name: str, event_id: str) -> Optional[Dict[str, Any]]:
+		"""Remove event_id's entry; return it, or None if it was not there."""
+		user = self._users.get(uid)
+		if not user:
+			return None
+		return user[list_name].pop(event_id, None)
+
+	def _add(self, uid: str, list_name: str, event_id: str) -> Tuple[bool, Dict[str, Any]]:
+		if self._popularity.stale(time.time()):
+			self._recount_popularity()
+		with self._locked(uid):
+			new_entry = {"event_id": event_id, "added_at": int(time.time())}
+			existing = self._apply_add(uid, list_name, new_entry)
+			if existing is not None:
+				return False, existing
+			self._popularity.add(event_id, new_entry["added_at"])
+			seq = self._journal.append({"op": "add", "uid": uid, "list": list_name, **new_entry})
+		with USERDATA_SAVE_SECONDS.time("journal"):
+			self._journal.wait_durable(seq)
+		self._maybe_compact()
+		return True, new_entry
+
+	def _remove(self, uid: str, list_name: str, event_id: str) -> bool:
+		if self._popularity.stale(time.time()):
+			self._recount_popularity()
+		with self._locked(uid):
+			removed = self._apply_remove(uid, list_name, event_id)
+			if removed is None:
+				return False
+			self._popularity.remove(event_id, removed.get("added_at"))
+			seq = self._journal.append({"op": "remove", "uid": uid, "list": list_name, "event_id": event_id})
+		with USERDATA_SAVE_SECONDS.time("journal"):
+			self._journal.wait_durable(seq)
+		self._maybe_compact()
+		return True
+
 	def get_user_profile(self, uid: str) -> Dict[str, Any]:
-		with self._lock:
-			user = self._get_user(uid)
-			return {"uid": uid, "passport": list(user["passport"]), "favourite": list(user["favourite"])}
-	
+		with self._locked(uid):
+			return {"uid": uid, "passport": self._peek_list(uid, "passport"), "favourite": self._peek_list(uid, "favourite")}
+
 	def get_passport(self, uid: str) -> List[Dict[str, Any]]:
-		with self._lock:
-			return list(self._get_user(uid)["passport"])
-	
+		with self._locked(uid):
+			return self._peek_list(uid, "passport")
+
 	def get_favourite(self, uid: str) -> List[Dict[str, Any]]:
-		with self._lock:
-			return list(self._get_user(uid)["favourite"])
-	
+		with self._locked(uid):
+			return self._peek_list(uid, "favourite")
+
 	def add_to_passport(self, uid: str, event_id: str) -> Dict[str, Any]:
-		with self._lock:
-			user = self._get_user(uid)
-			for item in user["passport"]:
-				if item["event_id"] == event_id:
-					return {"added": False, "message": "Event already in passport", "event": item}
-			new_entry = {"event_id": event_id, "added_at": int(time.time())}
-			user["passport"].append(new_entry)
-			self._save_file()
-			return {"added": True, "message": "Event added to passport", "event": new_entry}
-	
+		added, entry = self._add(uid, "passport", event_id)
+		if not added:
+			return {"added": False, "message": "Event already in passport", "event": entry}
+		return {"added": True, "message": "Event added to passport", "event": entry}
+
 	def add_to_favourite(self, uid: str, event_id: str) -> Dict[str, Any]:
-		with self._lock:
-			user = self._get_user(uid)
-			for item in user["favourite"]:
-				if item["event_id"] == event_id:
-					return {"added": False, "message": "Event already in favourites", "event": item}
-			new_entry = {"event_id": event_id, "added_at": int(time.time())}
-			user["favourite"].append(new_entry)
-			self._save_file()
-			return {"added": True, "message": "Event added to favourites", "event": new_entry}
-	
+		added, entry = self._add(uid, "favourite", event_id)
+		if not added:
+			return {"added": False, "message": "Event already in favourites", "event": entry}
+		return {"added": True, "message": "Event added to favourites", "event": entry}
+
 	def remove_from_passport(self, uid: str, event_id: str) -> Dict[str, Any]:
-		with self._lock:
-			user = self._get_user(uid)
-			initial_len = len(user["passport"])
-			user["passport"] = [item for item in user["passport"] if item["event_id"] != event_id]
-			if len(user["passport"]) < initial_len:
-				self._save_file()
-				return {"removed": True, "message": "Event removed from passport"}
-			return {"removed": False, "message": "Event not found in passport"}
-	
+		if self._remove(uid, "passport", event_id):
+			return {"removed": True, "message": "Event removed from passport"}
+		return {"removed": False, "message": "Event not found in passport"}
+
 	def remove_from_favourite(self, uid: str, event_id: str) -> Dict[str, Any]:
-		with self._lock:
-			user = self._get_user(uid)
-			initial_len = len(user["favourite"])
-			user["favourite"] = [item for item in user["favourite"] if item["event_id"] != event_id]
-			if len(user["favourite"]) < initial_len:
-				self._save_file()
-				return {"removed": True, "message": "Event removed from favourites"}
-			return {"removed": False, "message": "Event not found in favourites"}
-	
+		if self._remove(uid, "favourite", event_id):
+			return {"removed": True, "message": "Event removed from favourites"}
+		return {"removed": False, "message": "Event not found in favourites"}
+
+	def top_events(self, k: int) -> List[Tuple[str, int]]:
+		"""Up to k (event_id, popularity) pairs, most passported/favourited first."""
+		if self._popularity.stale(time.time()):
+			self._recount_popularity()
+		return self._popularity.top(k)
+
 	def validate_event_exists(self, event_id: str, events_store) -> bool:
-		events_store.ensure_loaded()
-		return any(event.get("event_id") == event_id for event in events_store._events)
+		return events_store.has_event(event_id)
+
+	def close(self) -> None:
+		"""Compact outstanding journal records into userdata.json."""
+		self._compact()
+		self._journal.close()
+		self._owner_lock.close()
+
+
+def create_user_data_store(backend: Optional[str] = None) -> Union[UserDataStore, SqliteUserDataStore]:
+	"""Build the user data store selected by USERDATA_BACKEND ("json" or "sqlite")."""
+	backend = (backend or USERDATA_BACKEND).strip().lower()
+	if backend == "json":
+		return UserDataStore()
+	if backend == "sqlite":
+		from .user_data_sqlite import SqliteUserDataStore
+		return SqliteUserDataStore()
+	raise ValueError(f"Unknown USERDATA_BACKEND '{backend}' (expected 'json' or 'sqlite')")
 
 
-user_data_store = UserDataStore()
+user_data_store = create_user_data_store()
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import orjson
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.dirname(BENCH_DIR)
+DEFAULT_DATA_DIR = os.path.join(API_DIR, "bench-data")
+DEFAULT_RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def prepare_environment(data_dir: str, userdata_backend: str = "json") -> str:
+	"""Point the app's configuration at data_dir, with scratch copies of anything it writes.
+
+	app modules read their configuration (and open the user data store) on
+	import, so this must run before anything from app is imported. Returns the
+	scratch directory.
+	"""
+	events_path = os.path.join(data_dir, "events.json")
+	if not os.path.exists(events_path):
+		raise SystemExit(f"{events_path} not found; generate it with python -m benchmarks.synth")
+	workdir = tempfile.mkdtemp(prefix="events-bench-")
+	userdata_path = os.path.join(workdir, "userdata.json")
+	if os.path.exists(os.path.join(data_dir, "userdata.json")):
+		shutil.copyfile(os.path.join(data_dir, "userdata.json"), userdata_path)
+	os.makedirs(os.path.join(workdir, "images"))
+	os.environ.update({
+		"EVENTS_JSON_PATH": events_path,
+		"EVENTS_CACHE_DIR": os.path.join(workdir, "cache"),
+		"USERDATA_JSON_PATH": userdata_path,
+		"USERDATA_SQLITE_PATH": os.path.join(workdir, "userdata.sqlite3"),
+		"USERDATA_BACKEND": userdata_backend,
+		"IMAGES_DIR_PATH": os.path.join(workdir, "images"),
+		"IMAGE_CACHE_DIR": os.path.join(workdir, "cache", "images"),
+	})
+	if API_DIR not in sys.path:
+		sys.path.insert(0, API_DIR)
+	return workdir
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+	"""Nearest-rank percentile (q in 0..100) of an ascending sequence."""
+	if not sorted_values:
+		return 0.0
+	rank = max(1, min(len(sorted_values), math.ceil(q / 100.0 * len(sorted_values))))
+	return sorted_values[rank - 1]
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+	"""Count and millisecond statistics of durations given in seconds."""
+	values = sorted(samples)
+	if not values:
+		return {"count": 0}
+	return {
+		"count": len(values),
+		"mean_ms": sum(values) / len(values) * 1000,
+		"min_ms": values[0] * 1000,
+		"p50_ms": percentile(values, 50) * 1000,
+		"p90_ms": percentile(values, 90) * 1000,
+		"p99_ms": percentile(values, 99) * 1000,
+		"max_ms": values[-1] * 1000,
+	}
+
+
+def measure(fn: Callable[[], Any], min_time: float = 0.5, max_runs: int = 10000, warmup: int = 3) -> Dict[str, float]:
+	"""Call fn repeatedly for about min_time seconds (at least once) and summarize the durations."""
+	for _ in range(warmup):
+		fn()
+	samples: List[float] = []
+	deadline = time.perf_counter() + min_time
+	while len(samples) < max_runs:
+		start = time.perf_counter()
+		fn()
+		end = time.perf_counter()
+		samples.append(end - start)
+		if end >= deadline:
+			break
+	return summarize(samples)
+
+
+def _git_commit() -> Optional[str]:
+	try:
+		out = subprocess.run(
+			["git", "rev-parse", "--short", "HEAD"], cwd=API_DIR, capture_output=True, text=True, timeout=5
+		)
+	except (OSError, subprocess.SubprocessError):
+		return None
+	return out.stdout.strip() or None
+
+
+def run_meta(**extra: Any) -> Dict[str, Any]:
+	"""Where and on what a run happened, stored next to its results."""
+	return {
+		"time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+		"commit": _git_commit(),
+		"python": sys.version.split()[0],
+		"platform": platform.platform(),
+		"cpus": os.cpu_count(),
+		**extra,
+	}
+
+
+def write_results(path: Optional[str], kind: str, meta: Dict[str, Any], results: Dict[str, Any]) -> str:
+	"""Write {"kind", "meta", "results"} as JSON; by default to results/<kind>-<time>.json."""
+	if not path:
+		os.makedirs(DEFAULT_RESULTS_DIR, exist_ok=True)
+		path = os.path.join(DEFAULT_RESULTS_DIR, f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+	else:
+		os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+	with open(path, "wb") as f:
+		f.write(orjson.dumps({"kind": kind, "meta": meta, "results": results}, option=orjson.OPT_INDENT_2))
+	return path
+
+
+def print_table(results: Dict[str, Dict[str, float]], extra: Sequence[str] = ()) -> None:
+	columns = ("count", "p50_ms", "p99_ms", *extra)
+	width = max([len(name) for name in results] + [4])
+	print(f"{'case':<{width}}  " + "  ".join(f"{col:>10}" for col in columns))
+	for name, stats in results.items():
+		cells = []
+		for col in columns:
+			value = stats.get(col)
+			cells.append(f"{value:>10.3f}" if isinstance(value, float) else f"{value if value is not None else '-':>10}")
+		print(f"{name:<{width}}  " + "  ".join(cells))
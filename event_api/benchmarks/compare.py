@@ -0,0 +1,59 @@
+"""Compare two benchmark result files.
+
+	python -m benchmarks.compare benchmarks/results/micro-before.json benchmarks/results/micro-after.json
+
+Prints p50 and p99 of every case in both runs and the after/before ratio
+(below 1.0 is faster), flagging changes beyond --threshold.
+"""
+from __future__ import annotations
+
+import argparse
+from typing import Any, Dict
+
+import orjson
+
+
+def _load(path: str) -> Dict[str, Any]:
+	with open(path, "rb") as f:
+		return orjson.loads(f.read())
+
+
+def _ratio(before: Any, after: Any) -> str:
+	if not isinstance(before, (int, float)) or not isinstance(after, (int, float)) or before <= 0:
+		return "-"
+	return f"{after / before:.2f}x"
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+	parser.add_argument("before")
+	parser.add_argument("after")
+	parser.add_argument("--threshold", type=float, default=0.1, help="relative p50 change worth flagging")
+	args = parser.parse_args()
+	before, after = _load(args.before), _load(args.after)
+	if before.get("kind") != after.get("kind"):
+		print(f"[compare] warning: comparing a {before.get('kind')} run with a {after.get('kind')} run")
+	for label, run in (("before", before), ("after", after)):
+		meta = run.get("meta", {})
+		print(f"{label}: {meta.get('time')} commit {meta.get('commit')} events {meta.get('events')}")
+
+	names = list(before["results"]) + [name for name in after["results"] if name not in before["results"]]
+	width = max([len(name) for name in names] + [4])
+	print(f"\n{'case':<{width}}  {'p50 before':>10}  {'p50 after':>10}  {'ratio':>7}  {'p99 before':>10}  {'p99 after':>10}  {'ratio':>7}")
+	for name in names:
+		old, new = before["results"].get(name, {}), after["results"].get(name, {})
+		cells = []
+		for key in ("p50_ms", "p99_ms"):
+			cells.append(f"{old.get(key, float('nan')):>10.3f}  {new.get(key, float('nan')):>10.3f}  {_ratio(old.get(key), new.get(key)):>7}")
+		flag = ""
+		if old.get("p50_ms") and new.get("p50_ms"):
+			change = new["p50_ms"] / old["p50_ms"] - 1
+			if change > args.threshold:
+				flag = "  slower"
+			elif change < -args.threshold:
+				flag = "  faster"
+		print(f"{name:<{width}}  " + "  ".join(cells) + flag)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,166 @@
+"""In-process load driver against the FastAPI app.
+
+	python -m benchmarks.load --data bench-data/100k --duration 10 --concurrency 16
+
+Concurrent clients send a weighted mix of requests through httpx's ASGI
+transport (no sockets, so the numbers are the app's own cost), then
+throughput and p50/p99 latency per endpoint are printed and written as JSON
+for comparison with python -m benchmarks.compare.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from .common import DEFAULT_DATA_DIR, prepare_environment, print_table, run_meta, summarize, write_results
+from .synth import LATIN_WORDS, TITLE_WORDS
+
+# (endpoint name, method, path, query params)
+Request = Tuple[str, str, str, Dict[str, Any]]
+# (weight, builder of a request from a random source)
+Scenario = Tuple[int, Callable[[random.Random], Request]]
+
+
+def build_scenarios(snap: Any, uids: List[str]) -> List[Scenario]:
+	"""Weighted request mix, with arguments drawn from the loaded events."""
+	events = snap.events
+	venues = snap.venues or [{"platform": "", "latitude": 25.04, "longitude": 121.51}]
+	categories = snap.columns.category.values or [""]
+	words = list(TITLE_WORDS) + [word.lower() for word in LATIN_WORDS]
+	starts = snap.columns.starts
+	month = 30 * 86400
+
+	def event_id(rng: random.Random) -> str:
+		return events[rng.randrange(len(events))]["event_id"]
+
+	def window(rng: random.Random) -> Dict[str, Any]:
+		start = starts[rng.randrange(len(starts))]
+		return {"start_timestamp": start, "end_timestamp": start + month, "limit": 20}
+
+	def nearby(rng: random.Random) -> Dict[str, Any]:
+		venue = rng.choice(venues)
+		return {"lat": venue["latitude"], "lon": venue["longitude"], "radius_m": 1000}
+
+	return [
+		(10, lambda rng: ("/search", "GET", "/search", {"limit": 20})),
+		(8, lambda rng: ("/search?category", "GET", "/search", {"category": rng.choice(categories), "limit": 20})),
+		(6, lambda rng: ("/search?q", "GET", "/search", {"q": rng.choice(words), "limit": 20})),
+		(4, lambda rng: ("/search?window", "GET", "/search", window(rng))),
+		(3, lambda rng: ("/search?offset", "GET", "/search", {"limit": 20, "offset": rng.randrange(0, 200, 20)})),
+		(8, lambda rng: ("/recent", "GET", "/recent", {"amount": 20})),
+		(4, lambda rng: ("/random", "GET", "/random", {"amount": 5})),
+		(4, lambda rng: ("/hot", "GET", "/hot", {})),
+		(2, lambda rng: ("/venue", "GET", "/venue", {})),
+		(10, lambda rng: ("/event/{event_id}", "GET", f"/event/{event_id(rng)}", {})),
+		(4, lambda rng: ("/platform/{platform_name}", "GET", f"/platform/{rng.choice(venues)['platform']}", {})),
+		(4, lambda rng: ("/nearby", "GET", "/nearby", nearby(rng))),
+		(3, lambda rng: ("/facets", "GET", "/facets", {"category": rng.choice(categories)})),
+		(5, lambda rng: ("/users/{uid}", "GET", f"/users/{rng.choice(uids)}", {})),
+		(2, lambda rng: ("/users/{uid}/favourite", "POST", f"/users/{rng.choice(uids)}/favourite", {"event_id": event_id(rng)})),
+		(1, lambda rng: ("/users/{uid}/passport", "POST", f"/users/{rng.choice(uids)}/passport", {"event_id": event_id(rng)})),
+	]
+
+
+async def drive(
+	app: Any,
+	scenarios: List[Scenario],
+	duration: float,
+	concurrency: int,
+	seed: int,
+	headers: Dict[str, str],
+	only: str = "",
+) -> Tuple[Dict[str, List[float]], Dict[str, Dict[str, int]], float]:
+	"""Run concurrency clients for duration seconds; returns latencies and status counts per endpoint."""
+	import httpx
+
+	scenarios = [(weight, build) for weight, build in scenarios if only in build(random.Random(0))[0]]
+	if not scenarios:
+		raise SystemExit(f"no endpoint matches --only {only!r}")
+	weights = [weight for weight, _ in scenarios]
+	builders = [build for _, build in scenarios]
+	latencies: Dict[str, List[float]] = {}
+	statuses: Dict[str, Dict[str, int]] = {}
+	transport = httpx.ASGITransport(app=app)
+	async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers, timeout=None) as client:
+		deadline = time.perf_counter() + duration
+
+		async def client_loop(rng: random.Random) -> None:
+			while time.perf_counter() < deadline:
+				name, method, path, params = rng.choices(builders, weights)[0](rng)
+				start = time.perf_counter()
+				response = await client.request(method, path, params=params)
+				elapsed = time.perf_counter() - start
+				latencies.setdefault(name, []).append(elapsed)
+				counts = statuses.setdefault(name, {})
+				counts[str(response.status_code)] = counts.get(str(response.status_code), 0) + 1
+
+		started = time.perf_counter()
+		await asyncio.gather(*(client_loop(random.Random(seed * 1000 + i)) for i in range(concurrency)))
+		elapsed_total = time.perf_counter() - started
+	return latencies, statuses, elapsed_total
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+	parser.add_argument("--data", default=os.path.join(DEFAULT_DATA_DIR, "1k"), help="directory with events.json and userdata.json")
+	parser.add_argument("--duration", type=float, default=10.0, help="measured seconds")
+	parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds first (fills the caches)")
+	parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients")
+	parser.add_argument("--backend", default="json", choices=("json", "sqlite"), help="USERDATA_BACKEND")
+	parser.add_argument("--accept-encoding", default="gzip", help="Accept-Encoding sent by the clients")
+	parser.add_argument("--only", default="", help="send only requests whose endpoint name contains this")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--out", default=None, help="results file (default: benchmarks/results/load-<time>.json)")
+	args = parser.parse_args()
+
+	workdir = prepare_environment(os.path.abspath(args.data), args.backend)
+	try:
+		import orjson
+
+		from app import main as api
+
+		api._warmup()
+		snap = api.events_store.ensure_loaded()
+		with open(os.environ["USERDATA_JSON_PATH"], "rb") as f:
+			uids = list(orjson.loads(f.read())["users"])[:1000] or ["bench-user"]
+		scenarios = build_scenarios(snap, uids)
+		headers = {"Accept-Encoding": args.accept_encoding}
+		try:
+			if args.warmup > 0:
+				asyncio.run(drive(api.app, scenarios, args.warmup, args.concurrency, args.seed + 1, headers, args.only))
+			latencies, statuses, elapsed = asyncio.run(
+				drive(api.app, scenarios, args.duration, args.concurrency, args.seed, headers, args.only)
+			)
+		finally:
+			api._shutdown()
+
+		results: Dict[str, Dict[str, Any]] = {}
+		for name in sorted(latencies):
+			results[name] = {**summarize(latencies[name]), "rps": len(latencies[name]) / elapsed, "status": statuses[name]}
+		total = sum(len(samples) for samples in latencies.values())
+		results["total"] = {
+			**summarize([sample for samples in latencies.values() for sample in samples]),
+			"rps": total / elapsed,
+		}
+		meta = run_meta(
+			data=os.path.abspath(args.data),
+			events=len(snap.events),
+			duration=args.duration,
+			warmup=args.warmup,
+			concurrency=args.concurrency,
+			backend=args.backend,
+			accept_encoding=args.accept_encoding,
+		)
+		print_table(results, extra=("rps",))
+		print(f"[load] results written to {write_results(args.out, 'load', meta, results)}")
+	finally:
+		shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,204 @@
+"""Microbenchmarks of the EventsDataStore and user data store methods.
+
+	python -m benchmarks.micro --data bench-data/100k
+
+Each case is called repeatedly for --min-time seconds with arguments drawn
+from the data (event ids, platforms, venue coordinates, title words), and its
+latency percentiles are written as JSON for comparison with
+python -m benchmarks.compare. Loading and reloading the events are timed
+once each.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import shutil
+import time
+from itertools import cycle
+from typing import Any, Callable, Dict, List, Tuple
+
+import orjson
+
+from .common import DEFAULT_DATA_DIR, measure, prepare_environment, print_table, run_meta, summarize, write_results
+from .synth import LATIN_WORDS, TITLE_WORDS
+
+# Arguments drawn per parameterized case.
+SAMPLE_SIZE = 256
+# Share of events changed for the incremental reload case.
+RELOAD_CHANGED_RATIO = 0.01
+LOAD_CASES = ("load.cold", "load.shared_cache", "load.reload_1pct_changed")
+
+Case = Tuple[str, Callable[[], Any]]
+
+
+def _timed_once(fn: Callable[[], Any]) -> Dict[str, float]:
+	start = time.perf_counter()
+	fn()
+	return summarize([time.perf_counter() - start])
+
+
+def load_cases(events_path: str, workdir: str) -> Dict[str, Dict[str, float]]:
+	"""Cold load, load from the shared snapshot file, and an incremental reload."""
+	from app.data_loader import EventsDataStore, EventsSnapshot
+
+	results: Dict[str, Dict[str, float]] = {}
+	results["load.cold"] = _timed_once(lambda: EventsDataStore(events_path, cache_dir="").ensure_loaded())
+	cache_dir = os.path.join(workdir, "load-cache")
+	EventsDataStore(events_path, cache_dir=cache_dir).ensure_loaded()
+	results["load.shared_cache"] = _timed_once(lambda: EventsDataStore(events_path, cache_dir=cache_dir).ensure_loaded())
+	shutil.rmtree(cache_dir, ignore_errors=True)
+
+	with open(events_path, "rb") as f:
+		raw = f.read()
+	previous = EventsSnapshot(orjson.loads(raw))
+	changed = orjson.loads(raw)
+	rng = random.Random(0)
+	for idx in rng.sample(range(len(changed)), int(len(changed) * RELOAD_CHANGED_RATIO)):
+		changed[idx]["title"] = f"{changed[idx].get('title', '')} {rng.choice(TITLE_WORDS)}"
+	results["load.reload_1pct_changed"] = _timed_once(lambda: EventsSnapshot(changed, previous=previous))
+	return results
+
+
+def events_cases(store: Any, rng: random.Random) -> List[Case]:
+	from app.query_cache import QueryResultCache
+
+	snap = store.ensure_loaded()
+	events = snap.events
+	ids = cycle([events[i]["event_id"] for i in rng.sample(range(len(events)), min(SAMPLE_SIZE, len(events)))])
+	id_batches = cycle([[next(ids) for _ in range(6)] for _ in range(32)])
+	platforms = cycle(rng.sample([venue["platform"] for venue in snap.venues], min(SAMPLE_SIZE, len(snap.venues))))
+	points = cycle([(venue["latitude"], venue["longitude"]) for venue in rng.sample(snap.venues, min(SAMPLE_SIZE, len(snap.venues)))])
+	categories = cycle(snap.columns.category.values)
+	words = cycle(list(TITLE_WORDS) + [word.lower()[:3] for word in LATIN_WORDS])
+	starts = sorted(snap.columns.starts)
+	month = 30 * 86400
+	windows = cycle([(start, start + month) for start in rng.sample(starts, min(SAMPLE_SIZE, len(starts)))])
+	page = [events[i] for i in snap.sorted_indices_start_desc[:20]]
+	cursor_events = cycle([events[i] for i in rng.sample(range(len(events)), min(SAMPLE_SIZE, len(events)))])
+
+	def window_filter() -> Any:
+		start, end = next(windows)
+		return store.filter_events(start_timestamp_min=start, end_timestamp_max=end, limit=20)
+
+	def after_cursor() -> Any:
+		event = next(cursor_events)
+		return store.filter_events(limit=20, after=(event["start_timestamp"], event["event_id"]))
+
+	def platform_window() -> Any:
+		start, end = next(windows)
+		return store.get_events_by_platform(next(platforms), start, end)
+
+	cases: List[Case] = [
+		("events.get_random", lambda: store.get_random(5)),
+		("events.get_random.distinct_venue", lambda: store.get_random(5, distinct_venue=True)),
+		("events.get_recent", lambda: store.get_recent(20)),
+		("events.has_event", lambda: store.has_event(next(ids))),
+		("events.get_event_by_id", lambda: store.get_event_by_id(next(ids))),
+		("events.get_events_by_ids", lambda: store.get_events_by_ids(next(id_batches))),
+		("events.get_events_by_platform", lambda: store.get_events_by_platform(next(platforms))),
+		("events.get_events_by_platform.window", platform_window),
+		("events.get_nearby.radius_1km", lambda: store.get_nearby(*next(points), radius_m=1000)),
+		("events.get_nearby.k10", lambda: store.get_nearby(*next(points), k=10)),
+		("events.get_all_venues", store.get_all_venues),
+		("events.render_venues", store.render_venues),
+		("events.render_events.page20", lambda: store.render_events(page, "http://bench")),
+		("events.render_event", lambda: store.render_event(store.get_event_by_id(next(ids)), "http://bench")),
+		("events.stream_events.page20", lambda: b"".join(store.stream_events(page, "http://bench"))),
+	]
+	# filter_events and facets without the result cache, then one case with it.
+	uncached = [
+		("events.filter_events.all.limit20", lambda: store.filter_events(limit=20)),
+		("events.filter_events.all.start_asc.limit20", lambda: store.filter_events(limit=20, sort="start_asc")),
+		("events.filter_events.category.limit20", lambda: store.filter_events(categories=[next(categories)], limit=20)),
+		("events.filter_events.category.all", lambda: store.filter_events(categories=[next(categories)])),
+		("events.filter_events.window.limit20", window_filter),
+		("events.filter_events.after_cursor", after_cursor),
+		("events.filter_events.text", lambda: store.filter_events(text=next(words), limit=20)),
+		("events.filter_events.text.relevance", lambda: store.filter_events(text=next(words), limit=20, sort="relevance")),
+		("events.facets", lambda: store.facets(categories=[next(categories)])),
+		("events.facets.calendar_day", lambda: store.facets(calendar="day")),
+	]
+
+	def without_cache(fn: Callable[[], Any]) -> Callable[[], Any]:
+		def run() -> Any:
+			cache, store.query_cache = store.query_cache, QueryResultCache(0)
+			try:
+				return fn()
+			finally:
+				store.query_cache = cache
+		return run
+
+	cases.extend((name, without_cache(fn)) for name, fn in uncached)
+	cases.append(("events.filter_events.category.limit20.cached", lambda: store.filter_events(categories=[next(categories)], limit=20)))
+	return cases
+
+
+def userdata_cases(name: str, store: Any, event_ids: List[str], rng: random.Random) -> List[Case]:
+	uids = cycle([f"bench-user-{i}" for i in range(SAMPLE_SIZE)])
+	ids = cycle(rng.sample(event_ids, min(SAMPLE_SIZE, len(event_ids))))
+	for _ in range(SAMPLE_SIZE):
+		store.add_to_passport(next(uids), next(ids))
+
+	def add_remove() -> None:
+		uid, event_id = next(uids), next(ids)
+		store.add_to_favourite(uid, event_id)
+		store.remove_from_favourite(uid, event_id)
+
+	return [
+		(f"{name}.get_user_profile", lambda: store.get_user_profile(next(uids))),
+		(f"{name}.get_passport", lambda: store.get_passport(next(uids))),
+		(f"{name}.add_to_passport.existing", lambda: store.add_to_passport(next(uids), next(ids))),
+		(f"{name}.add_remove_favourite", add_remove),
+	]
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+	parser.add_argument("--data", default=os.path.join(DEFAULT_DATA_DIR, "1k"), help="directory with events.json and userdata.json")
+	parser.add_argument("--min-time", type=float, default=0.5, help="seconds each case runs for")
+	parser.add_argument("--only", default="", help="run only cases whose name contains this")
+	parser.add_argument("--skip-load", action="store_true", help="skip the (slow on large data) load cases")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--out", default=None, help="results file (default: benchmarks/results/micro-<time>.json)")
+	args = parser.parse_args()
+
+	workdir = prepare_environment(os.path.abspath(args.data))
+	try:
+		from app.data_loader import EventsDataStore
+		from app.user_data_sqlite import SqliteUserDataStore
+		from app.user_data_store import UserDataStore
+
+		events_path = os.environ["EVENTS_JSON_PATH"]
+		results: Dict[str, Dict[str, float]] = {}
+		if not args.skip_load and any(args.only in name for name in LOAD_CASES):
+			results.update(load_cases(events_path, workdir))
+
+		rng = random.Random(args.seed)
+		store = EventsDataStore(events_path, cache_dir="")
+		snap = store.ensure_loaded()
+		event_ids = [event["event_id"] for event in snap.events]
+		# The app's own store already holds USERDATA_JSON_PATH, so benchmark a copy.
+		userdata_path = os.path.join(workdir, "micro-userdata.json")
+		shutil.copyfile(os.environ["USERDATA_JSON_PATH"], userdata_path)
+		json_store = UserDataStore(userdata_path, compact_every=0)
+		sqlite_store = SqliteUserDataStore(os.environ["USERDATA_SQLITE_PATH"], userdata_path)
+		cases = events_cases(store, rng)
+		cases += userdata_cases("userdata_json", json_store, event_ids, rng)
+		cases += userdata_cases("userdata_sqlite", sqlite_store, event_ids, rng)
+		for name, fn in cases:
+			if args.only in name:
+				results[name] = measure(fn, min_time=args.min_time)
+				print(f"[micro] {name}: p50 {results[name]['p50_ms']:.3f} ms")
+		json_store.close()
+		sqlite_store.close()
+
+		meta = run_meta(data=os.path.abspath(args.data), events=len(snap.events), min_time=args.min_time)
+		print_table(results)
+		print(f"[micro] results written to {write_results(args.out, 'micro', meta, results)}")
+	finally:
+		shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,218 @@
+"""Synthetic events.json / userdata.json in the scraper's schema.
+
+	python -m benchmarks.synth --events 100000 --users 10000
+
+writes bench-data/100k/events.json and userdata.json. The same seed always
+produces the same files. Events are streamed to disk, so 1M events do not
+need to fit in memory as Python objects.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from typing import Any, Dict, List, Set, Tuple
+
+import orjson
+
+from .common import DEFAULT_DATA_DIR
+
+TAIPEI = timezone(timedelta(hours=8))
+# Events start within this many days after BASE_DATE.
+BASE_DATE = datetime(2025, 11, 1, tzinfo=TAIPEI)
+SPAN_DAYS = 365
+
+# Mix of the real data (cultureexpress.taipei).
+CATEGORIES: Tuple[Tuple[str, int], ...] = (("講座", 75), ("展覽", 65), ("表演藝術", 37), ("音樂現場", 31), ("藝文活動", 1))
+MISSING_CATEGORY_RATE = 0.075
+TICKET_TYPES: Tuple[Tuple[str, int], ...] = (("免費", 121), ("售票", 102), ("索票", 3))
+SESSION_COUNTS: Tuple[Tuple[int, int], ...] = ((1, 188), (2, 7), (3, 7), (4, 9), (5, 4), (6, 2), (8, 1), (12, 2), (13, 2), (22, 2))
+
+TITLE_WORDS = (
+	"青年", "國樂", "音樂會", "城市", "記憶", "劇場", "舞蹈", "文學", "森林", "工作坊", "講堂", "展覽", "攝影",
+	"臺北", "藝術", "季", "夏日", "冬季", "親子", "導覽", "電影", "放映", "故事", "手作", "爵士", "古典", "室內樂",
+	"合唱", "歌劇", "街頭", "市集", "島嶼", "山海", "時光", "初心", "逐夢", "溫馨", "系列", "特展", "沙龍",
+)
+LATIN_WORDS = ("TCO", "Jazz", "Live", "Art", "Festival", "Taipei", "Music", "Talk", "Open", "Studio", "PLAYground")
+DESCRIPTION_WORDS = (
+	"追逐夢想", "不忘初心", "本場", "透過", "動人的旋律", "帶領大家", "重拾初衷", "擁抱夢想", "讓我們", "在音樂的流動中",
+	"回望起點", "勇敢前行", "感受", "最純粹的", "感動與力量", "歡迎", "闔家", "共同參與", "藝術家", "創作", "分享",
+	"城市的", "日常", "生活", "對話", "探索", "歷史", "文化", "風景", "邀請", "觀眾", "一同", "走進", "展場",
+)
+ORGANIZER_WORDS = ("臺北市立", "國樂團", "交響樂團", "文化基金會", "藝術中心", "美術館", "圖書館", "文學館", "協會", "劇團")
+DISTRICTS = ("中正區", "大同區", "中山區", "松山區", "大安區", "萬華區", "信義區", "士林區", "北投區", "內湖區", "南港區", "文山區")
+ROADS = ("延平南路", "忠孝東路", "仁愛路", "信義路", "和平西路", "中山北路", "羅斯福路", "南京東路", "民生東路", "敦化南路")
+VENUE_WORDS = ("中山堂", "演藝廳", "文學森林", "劇場", "藝文大樓", "沙龍", "展覽室", "表演藝術中心", "基金會", "書店", "紀念館")
+SURNAMES = ("陳", "林", "黃", "張", "李", "王", "吳", "劉", "蔡", "楊", "郭")
+GIVEN = ("沛溱", "怡君", "志明", "雅婷", "冠宇", "淑芬", "家豪", "佳穎", "俊傑", "美玲")
+
+# Taipei and surroundings.
+LAT_RANGE = (24.96, 25.15)
+LON_RANGE = (121.45, 121.65)
+
+
+def _weighted(rng: random.Random, table: Tuple[Tuple[Any, int], ...]) -> Any:
+	values, weights = zip(*table)
+	return rng.choices(values, weights)[0]
+
+
+def _uuid(rng: random.Random) -> str:
+	return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _iso(timestamp: int) -> str:
+	return datetime.fromtimestamp(timestamp, TAIPEI).isoformat()
+
+
+def _venues(rng: random.Random, count: int) -> List[Dict[str, Any]]:
+	venues: List[Dict[str, Any]] = []
+	names: Set[str] = set()
+	while len(venues) < count:
+		name = f"{rng.choice(('臺北市', '臺北', '市立', ''))}{rng.choice(TITLE_WORDS)}{rng.choice(VENUE_WORDS)}"
+		if name in names:
+			name += f" {len(venues)}"
+		names.add(name)
+		venues.append({
+			"platform": name,
+			"address": f"臺北市{rng.choice(DISTRICTS)}{rng.choice(ROADS)}{rng.randint(1, 300)}號",
+			"latitude": round(rng.uniform(*LAT_RANGE), 4),
+			"longitude": round(rng.uniform(*LON_RANGE), 4),
+		})
+	return venues
+
+
+def _text(rng: random.Random, words: Tuple[str, ...], low: int, high: int) -> str:
+	return "".join(rng.choice(words) for _ in range(rng.randint(low, high)))
+
+
+def _event(rng: random.Random, venues: List[Dict[str, Any]], base: int) -> Dict[str, Any]:
+	event_id = _uuid(rng)
+	title = _text(rng, TITLE_WORDS, 2, 6)
+	if rng.random() < 0.3:
+		title = f"{rng.choice(LATIN_WORDS)}【{title}】{_text(rng, TITLE_WORDS, 1, 3)}"
+	category = _weighted(rng, CATEGORIES)
+	exhibition = category == "展覽"
+	start = base + rng.randrange(SPAN_DAYS * 24) * 3600
+	duration = rng.randint(7, 120) * 86400 if exhibition else rng.randint(1, 4) * 3600
+	session_count = 1 if exhibition else _weighted(rng, SESSION_COUNTS)
+	home = rng.choice(venues)
+	sessions = []
+	for index in range(session_count):
+		venue = home if rng.random() < 0.8 else rng.choice(venues)
+		session_start = start + index * rng.choice((1, 2, 7)) * 86400
+		session_end = session_start + duration
+		sessions.append({
+			"index": index + 1,
+			"platform": venue["platform"],
+			"venue_name": "實體活動",
+			"address": venue["address"],
+			"google_maps_url": f"https://www.google.com/maps/search/?api=1&query={venue['latitude']},{venue['longitude']}",
+			"latitude": venue["latitude"],
+			"longitude": venue["longitude"],
+			"start_datetime_iso": _iso(session_start),
+			"end_datetime_iso": _iso(session_end),
+			"start_timestamp": session_start,
+			"end_timestamp": session_end,
+			"event_timezone": "Asia/Taipei",
+		})
+	end = max(session["end_timestamp"] for session in sessions)
+	event: Dict[str, Any] = {
+		"event_id": event_id,
+		"detail_page_url": f"https://cultureexpress.taipei/Event/C000003?ID={event_id}&PageIndex=1&PageType=1",
+		"title": title,
+		"category": category,
+		"event_timezone": "Asia/Taipei",
+		"start_datetime_iso": _iso(start),
+		"start_timestamp": start,
+		"end_datetime_iso": _iso(end),
+		"end_timestamp": end,
+		"event_description": _text(rng, DESCRIPTION_WORDS, 8, 30) + "。",
+		"organizer": _text(rng, ORGANIZER_WORDS, 1, 3),
+		"ticket_type": _weighted(rng, TICKET_TYPES),
+		"contact_person": rng.choice(SURNAMES) + rng.choice(GIVEN),
+		"contact_phone": f"02-{rng.randint(20000000, 29999999)}",
+		"event_url": f"https://example.org/events/{event_id}",
+		"image_url": f"https://cultureexpress.taipei/UploadPlugin?file={event_id}",
+		"sessions": sessions,
+		"scraped_at": datetime.fromtimestamp(base, TAIPEI).replace(tzinfo=None).isoformat(),
+		"local_image_path": f"output\\images\\{event_id}.jpg",
+	}
+	if rng.random() < MISSING_CATEGORY_RATE:
+		del event["category"]
+		event["_partial"] = True
+	return event
+
+
+def write_events(path: str, count: int, seed: int = 0) -> List[str]:
+	"""Write count synthetic events to path; returns their event_ids in file order."""
+	rng = random.Random(seed)
+	venues = _venues(rng, max(20, count // 40))
+	base = int(BASE_DATE.timestamp())
+	event_ids: List[str] = []
+	tmp_path = path + ".tmp"
+	with open(tmp_path, "wb") as f:
+		f.write(b"[")
+		for i in range(count):
+			event = _event(rng, venues, base)
+			event_ids.append(event["event_id"])
+			if i:
+				f.write(b",")
+			f.write(orjson.dumps(event))
+		f.write(b"]")
+	os.replace(tmp_path, path)
+	return event_ids
+
+
+def write_userdata(path: str, event_ids: List[str], users: int, seed: int = 0) -> None:
+	"""Write userdata.json for users with passport/favourite lists.
+
+	Event popularity is Zipf-like, so a few events are in many lists, as real
+	"hot" events would be.
+	"""
+	rng = random.Random(seed + 1)
+	cum_weights = list(accumulate(1.0 / (rank + 1) for rank in range(len(event_ids))))
+	popular = event_ids[:]
+	rng.shuffle(popular)
+	base = int(BASE_DATE.timestamp())
+	data: Dict[str, Dict[str, Any]] = {}
+	for _ in range(users):
+		user: Dict[str, Any] = {}
+		for list_name, mean in (("passport", 5), ("favourite", 3)):
+			size = min(len(popular), int(rng.expovariate(1.0 / mean)))
+			picked = dict.fromkeys(rng.choices(popular, cum_weights=cum_weights, k=size)) if size else {}
+			user[list_name] = [
+				{"event_id": event_id, "added_at": base + rng.randrange(SPAN_DAYS * 86400)} for event_id in picked
+			]
+		data[_uuid(rng)] = user
+	with open(path, "wb") as f:
+		f.write(orjson.dumps({"users": data}, option=orjson.OPT_INDENT_2))
+
+
+def size_label(count: int) -> str:
+	if count >= 1_000_000 and count % 1_000_000 == 0:
+		return f"{count // 1_000_000}m"
+	if count >= 1000 and count % 1000 == 0:
+		return f"{count // 1000}k"
+	return str(count)
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+	parser.add_argument("--events", type=int, default=1000, help="number of events (e.g. 1000, 100000, 1000000)")
+	parser.add_argument("--users", type=int, default=None, help="number of users (default: events / 10)")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--out", default=None, help="output directory (default: bench-data/<size>)")
+	args = parser.parse_args()
+	out = args.out or os.path.join(DEFAULT_DATA_DIR, size_label(args.events))
+	os.makedirs(out, exist_ok=True)
+	users = args.users if args.users is not None else max(1, args.events // 10)
+	event_ids = write_events(os.path.join(out, "events.json"), args.events, args.seed)
+	write_userdata(os.path.join(out, "userdata.json"), event_ids, users, args.seed)
+	print(f"[synth] wrote {args.events} events and {users} users to {out}")
+
+
+if __name__ == "__main__":
+	main()
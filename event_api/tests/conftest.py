@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+# app modules read their configuration (and open the user data store) on
+# import, so point everything they write at a scratch directory first.
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRATCH_DIR = tempfile.mkdtemp(prefix="event-api-tests-")
+os.environ.update({
+	"USERDATA_JSON_PATH": os.path.join(SCRATCH_DIR, "userdata.json"),
+	"USERDATA_SQLITE_PATH": os.path.join(SCRATCH_DIR, "userdata.sqlite3"),
+	"EVENTS_CACHE_DIR": "",
+	"IMAGE_CACHE_DIR": os.path.join(SCRATCH_DIR, "image-cache"),
+})
+if API_DIR not in sys.path:
+	sys.path.insert(0, API_DIR)
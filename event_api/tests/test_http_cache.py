@@ -0,0 +1,30 @@
+from app import http_cache
+from app.http_cache import data_etag, render_fingerprint
+
+QUERY = [("category", "展覽"), ("limit", "20")]
+
+
+def test_equivalent_queries_share_a_tag():
+	assert data_etag("abc", "/search", QUERY) == data_etag("abc", "/search", list(reversed(QUERY)))
+
+
+def test_data_and_variant_change_the_tag():
+	base = data_etag("abc", "/hot", [])
+	assert data_etag("abd", "/hot", []) != base
+	assert data_etag("abc", "/hot", [], variant="e1,e2") != base
+
+
+def test_render_settings_change_the_tag(monkeypatch):
+	base = data_etag("abc", "/search", QUERY)
+	assert data_etag("abc", "/search", QUERY, render=render_fingerprint()) == base
+
+	monkeypatch.setattr(http_cache, "THUMBNAIL_WIDTH", http_cache.THUMBNAIL_WIDTH + 160)
+	assert data_etag("abc", "/search", QUERY, render=render_fingerprint()) != base
+	monkeypatch.undo()
+
+	monkeypatch.setattr(http_cache, "RENDER_FORMAT_VERSION", http_cache.RENDER_FORMAT_VERSION + 1)
+	assert data_etag("abc", "/search", QUERY, render=render_fingerprint()) != base
+	monkeypatch.undo()
+
+	monkeypatch.setitem(http_cache.VIEWS, "card", http_cache.VIEWS["card"] + ("venue",))
+	assert data_etag("abc", "/search", QUERY, render=render_fingerprint()) != base
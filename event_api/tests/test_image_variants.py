@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+from app.image_variants import ImageVariantStore
+
+Image = pytest.importorskip("PIL.Image")
+
+
+@pytest.fixture
+def store(tmp_path):
+	images = tmp_path / "images"
+	images.mkdir()
+	variants = ImageVariantStore(str(images), str(tmp_path / "cache"), max_bytes=10**8, workers=1)
+	yield variants
+	variants.shutdown()
+
+
+@pytest.mark.parametrize("fmt", ["jpeg", "png", "webp"])
+def test_cmyk_source_converts_for_every_format(store, fmt):
+	Image.new("CMYK", (800, 600), (10, 20, 30, 0)).save(os.path.join(store._images_dir, "cmyk.jpg"))
+	path = store.get_variant("cmyk.jpg", 320, fmt=fmt)
+	with Image.open(path) as img:
+		assert img.width == 320
+		assert img.mode in ("RGB", "RGBA")
+
+
+def test_palette_with_transparency_keeps_alpha_only_where_supported(store):
+	img = Image.new("P", (400, 300))
+	img.info["transparency"] = 0
+	img.save(os.path.join(store._images_dir, "logo.png"), transparency=0)
+	with Image.open(store.get_variant("logo.png", 320, fmt="png")) as out:
+		assert out.mode == "RGBA"
+	with Image.open(store.get_variant("logo.png", 320, fmt="jpeg")) as out:
+		assert out.mode == "RGB"
+
+
+def test_corrupt_source_returns_none_and_is_remembered(store, monkeypatch):
+	source = os.path.join(store._images_dir, "broken.jpg")
+	with open(source, "wb") as f:
+		f.write(b"\xff\xd8\xff\xe0 truncated")
+	assert store.get_variant("broken.jpg", 320, fmt="png") is None
+	cache_files = os.listdir(store._cache_dir) if os.path.isdir(store._cache_dir) else []
+	assert not [name for name in cache_files if name.endswith(".tmp")]
+
+	calls = []
+	monkeypatch.setattr(store, "_generate", lambda *args: calls.append(args))
+	assert store.get_variant("broken.jpg", 320, fmt="png") is None
+	assert calls == []  # the failure is cached until the source changes
+
+	Image.new("RGB", (640, 480)).save(source, format="JPEG")
+	os.utime(source, (1, 1))
+	monkeypatch.undo()
+	assert store.get_variant("broken.jpg", 320, fmt="png") is not None
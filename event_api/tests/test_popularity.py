@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+from app.popularity import EPOCH_HALF_LIVES, PopularityCounter
+from app.user_data_sqlite import SqliteUserDataStore
+from app.user_data_store import UserDataStore
+
+HOUR = 3600.0
+START = 1_760_000_000.0
+
+
+class Clock:
+	def __init__(self, now: float) -> None:
+		self.now = now
+
+	def __call__(self) -> float:
+		return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+	fake = Clock(START)
+	monkeypatch.setattr(time, "time", fake)
+	return fake
+
+
+def open_json(tmp_path, half_life):
+	return UserDataStore(str(tmp_path / "userdata.json"), compact_every=0, popularity_half_life=half_life)
+
+
+def open_sqlite(tmp_path, half_life):
+	return SqliteUserDataStore(str(tmp_path / "userdata.sqlite3"), str(tmp_path / "none.json"), popularity_half_life=half_life)
+
+
+def fill(store, clock):
+	"""Three users liked "old" and then three hours later two liked "new"."""
+	for uid in ("a", "b", "c"):
+		store.add_to_favourite(uid, "old")
+	store.add_to_passport("a", "tie-2")
+	store.add_to_passport("a", "tie-1")
+	clock.now += 3 * HOUR
+	store.add_to_favourite("d", "new")
+	store.add_to_passport("e", "new")
+	store.add_to_favourite("e", "gone")
+	store.remove_from_favourite("e", "gone")
+
+
+def test_counter_ranks_ties_by_event_id():
+	counter = PopularityCounter()
+	counter.load([("b", 0), ("a", 0), ("c", 0), ("c", 0)], START)
+	assert counter.top(3) == [("c", 2), ("a", 1), ("b", 1)]
+	counter.remove("c", 0)
+	assert counter.top(3) == [("a", 1), ("b", 1), ("c", 1)]
+
+
+@pytest.mark.parametrize("opener", [open_json, open_sqlite])
+def test_ranking_survives_restart(tmp_path, clock, opener):
+	store = opener(tmp_path, HOUR)
+	fill(store, clock)
+	live = store.top_events(10)
+	assert [event_id for event_id, _ in live] == ["new", "old", "tie-1", "tie-2"]
+	store.close()
+
+	clock.now += HOUR
+	reopened = opener(tmp_path, HOUR)
+	assert reopened.top_events(10) == live
+	reopened.close()
+
+
+def test_backends_rank_alike_across_epochs(tmp_path, clock):
+	json_store, sqlite_store = open_json(tmp_path, HOUR), open_sqlite(tmp_path, HOUR)
+	fill(json_store, clock)
+	clock.now -= 3 * HOUR
+	fill(sqlite_store, clock)
+	assert json_store.top_events(10) == sqlite_store.top_events(10)
+
+	clock.now += EPOCH_HALF_LIVES * HOUR  # scores are recounted for the next epoch
+	json_store.add_to_favourite("f", "old")
+	sqlite_store.add_to_favourite("f", "old")
+	assert json_store.top_events(10) == sqlite_store.top_events(10)
+	assert json_store.top_events(1)[0][0] == "old"
+	json_store.close()
+	sqlite_store.close()
+
+
+def test_without_half_life_scores_are_counts(tmp_path, clock):
+	store = open_json(tmp_path, 0)
+	fill(store, clock)
+	assert store.top_events(2) == [("old", 3), ("new", 2)]
+	store.close()
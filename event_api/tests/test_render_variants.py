@@ -0,0 +1,35 @@
+import os
+
+import orjson
+
+from app.data_loader import MAX_FIELDS_RENDER_VARIANTS, EventsSnapshot
+from app.projection import VIEWS, parse_projection
+
+EVENTS_JSON = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "output", "events.json")
+BASE_URL = "http://api"
+
+
+def snapshot():
+	with open(EVENTS_JSON, "rb") as f:
+		return EventsSnapshot(orjson.loads(f.read())[:20])
+
+
+def test_fields_projections_cannot_evict_full_and_view_renders():
+	snap = snapshot()
+	names = sorted(snap.field_names)
+	for i in range(40):
+		snap.render_event(0, BASE_URL, parse_projection(f"{names[i % len(names)]},{names[(i * 7) % len(names)]}"))
+	snap.render_event(0, BASE_URL, None)
+	snap.render_event(0, BASE_URL, VIEWS["card"])
+	assert (BASE_URL, None) in snap._fragments
+	assert (BASE_URL, VIEWS["card"]) in snap._fragments
+	ad_hoc = [projection for _, projection in snap._fragments if projection not in (None, VIEWS["card"])]
+	assert len(ad_hoc) == MAX_FIELDS_RENDER_VARIANTS
+
+
+def test_unknown_field_names_share_one_render():
+	snap = snapshot()
+	first = snap.render_event(0, BASE_URL, parse_projection("title,nope"))
+	second = snap.render_event(0, BASE_URL, parse_projection("title,bogus,zzz"))
+	assert first == second == orjson.dumps({"event_id": snap.events[0]["event_id"], "title": snap.events[0]["title"]})
+	assert len(snap._fragments) == 1
@@ -0,0 +1,27 @@
+import gzip
+
+from app import response_cache as module
+from app.response_cache import ResponseCache
+
+
+def test_only_cacheable_bodies_get_the_slow_level(monkeypatch):
+	calls = []
+	real = module.compress
+	monkeypatch.setattr(module, "compress", lambda body, encoding, fast=False: calls.append(fast) or real(body, encoding, fast))
+	cache = ResponseCache(max_bytes=8 * 4096, min_compress_bytes=16)
+
+	small = b'{"events": []}' * 100
+	body, applied = cache.encode(small, "gzip")
+	assert applied == "gzip" and gzip.decompress(body) == small
+	big = b'{"events": []}' * 1000
+	body, applied = cache.encode(big, "gzip")
+	assert applied == "gzip" and gzip.decompress(body) == big
+	assert calls == [False, True]
+
+	cache.put("h", "etag-big", "gzip", big, {})
+	assert cache.get("h", "etag-big", "gzip") is None
+
+
+def test_small_bodies_stay_uncompressed():
+	cache = ResponseCache(max_bytes=1 << 20, min_compress_bytes=1024)
+	assert cache.encode(b"{}", "gzip") == (b"{}", None)
@@ -0,0 +1,78 @@
+import threading
+
+from app.journal import AppendOnlyJournal
+from app.user_data_store import UserDataStore
+
+WRITERS = 8
+OPS = 150
+
+
+def churn(store, writer):
+	for i in range(OPS):
+		uid = f"user-{writer}"
+		store.add_to_favourite(uid, f"event-{i % 40}")
+		if i % 3 == 0:
+			store.remove_from_favourite(uid, f"event-{(i * 7) % 40}")
+		store.add_to_passport(uid, f"event-{writer}-{i}")
+
+
+def run_writers(store):
+	threads = [threading.Thread(target=churn, args=(store, writer)) for writer in range(WRITERS)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+
+
+def profiles(store):
+	return {f"user-{w}": store.get_user_profile(f"user-{w}") for w in range(WRITERS)}
+
+
+def test_background_compaction_keeps_every_write(tmp_path):
+	path = str(tmp_path / "userdata.json")
+	store = UserDataStore(path, compact_every=25)
+	run_writers(store)
+	expected = profiles(store)
+	with store._compact_lock:  # wait for a background compaction still running
+		pass
+	assert len(store._journal) < WRITERS * OPS
+	store.close()
+
+	reopened = UserDataStore(path, compact_every=25)
+	assert profiles(reopened) == expected
+	reopened.close()
+
+
+def test_snapshot_plus_journal_recovers_without_a_final_compaction(tmp_path):
+	path = str(tmp_path / "userdata.json")
+	store = UserDataStore(path, compact_every=25)
+	run_writers(store)
+	expected = profiles(store)
+	with store._compact_lock:
+		pass
+	# As if the process died: nothing is folded in on the way out.
+	store._journal.close()
+	store._owner_lock.close()
+
+	reopened = UserDataStore(path, compact_every=25)
+	assert profiles(reopened) == expected
+	reopened.close()
+
+
+def test_truncate_past_the_durable_records(tmp_path):
+	path = str(tmp_path / "userdata.json.journal")
+	journal = AppendOnlyJournal(path)
+	for round_ in range(4):
+		journal.wait_durable(journal.append({"op": "add", "n": round_}))
+		journal.append({"op": "add", "n": round_, "pending": True})  # appended, not yet flushed
+		journal.truncate(journal.mark())
+		assert len(journal) == 0
+		assert list(AppendOnlyJournal.replay(path)) == []
+	kept = journal.append({"op": "add", "n": "kept"})
+	journal.wait_durable(kept)
+	upto = journal.mark()
+	journal.wait_durable(journal.append({"op": "add", "n": "after"}))
+	journal.append({"op": "add", "n": "pending"})
+	journal.truncate(upto)
+	journal.close()
+	assert [record["n"] for record in AppendOnlyJournal.replay(path)] == ["after", "pending"]